@@ -0,0 +1,225 @@
+"""
+Admission control for parcel intake.
+
+Every API process samples the depth of parcel_queue every
+``sample_interval`` seconds with a passive declare and sheds intake before
+the broker fills up, instead of letting it reach its memory alarm and block
+every publisher:
+
+- at most ``max_in_flight`` intake requests of the process publish at once;
+- above ``soft_watermark`` ready messages, every session is limited to
+  ``session_rate`` parcels per second with bursts of ``session_burst``
+  (a rate of 0 sets no per-session limit);
+- above ``hard_watermark`` all intake is refused until the consumers catch up.
+
+Refused requests get a `Retry-After`. While the depth can't be read the
+watermarks don't apply, so a broken sample never stops intake by itself.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from loguru import logger
+
+from app.config import get_settings
+from app.metrics import Counter, Gauge
+from app.producer import publisher
+
+
+OPEN, THROTTLED, SHEDDING = "open", "throttled", "shedding"
+_STATES = (OPEN, THROTTLED, SHEDDING)
+
+ADMISSION_REJECTED = Counter(
+    "parcel_admission_rejected", "Intake requests refused by reason", ("reason",)
+)
+
+
+class Overloaded(Exception):
+    """Intake refused; the client should retry after ``retry_after`` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Intake refused ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """
+    Per-key token buckets, keeping the ``max_keys`` most recently used.
+    A ``rate`` of 0 or less lets every request through.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, tokens: int = 1) -> float:
+        """Take ``tokens`` from the bucket of ``key``; return 0 or the seconds to wait."""
+        if self.rate <= 0:
+            return 0.0
+        # Larger requests take a full bucket rather than never passing
+        tokens = min(tokens, self.burst)
+        now = time.monotonic()
+        available, updated = self._buckets.pop(key, (self.burst, now))
+        available = min(self.burst, available + (now - updated) * self.rate)
+        wait = 0.0
+        if available >= tokens:
+            available -= tokens
+        else:
+            wait = (tokens - available) / self.rate
+        self._buckets[key] = (available, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionController:
+    """
+    Decides whether an intake request may publish, from the sampled depth of
+    the queue and the requests of this process in flight.
+
+    ``sample`` returns the ready messages and the consumers of the queue; it
+    is the publisher's passive declare in the API and a stand-in in tests.
+    """
+
+    def __init__(
+        self,
+        sample: Callable[[], Awaitable[tuple[int, int]]],
+        enabled: bool = False,
+        max_in_flight: int = 512,
+        soft_watermark: int = 50_000,
+        hard_watermark: int = 200_000,
+        session_rate: float = 10.0,
+        session_burst: int = 100,
+        retry_after: int = 5,
+        sample_interval: float = 2.0,
+    ):
+        self.sample = sample
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.soft_watermark = soft_watermark
+        self.hard_watermark = hard_watermark
+        self.retry_after = retry_after
+        self.sample_interval = sample_interval
+        self.buckets = TokenBuckets(session_rate, session_burst)
+
+        self.in_flight = 0
+        self.depth: Optional[int] = None
+        self.consumers: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def state(self) -> str:
+        if self.depth is None or self.depth < self.soft_watermark:
+            return OPEN
+        if self.depth < self.hard_watermark:
+            return THROTTLED
+        return SHEDDING
+
+    async def refresh(self) -> None:
+        """Sample the queue once; an unreadable depth lifts the watermarks."""
+        previous = self.state
+        try:
+            self.depth, self.consumers = await self.sample()
+        except Exception as e:
+            logger.warning(f"Error sampling the depth of parcel_queue: {e}")
+            self.depth = self.consumers = None
+        if self.state != previous:
+            logger.info(
+                f"Intake {self.state}: {self.depth} messages ready, "
+                f"{self.consumers} consumers"
+            )
+
+    def _reject(self, reason: str, retry_after: int) -> None:
+        ADMISSION_REJECTED.labels(reason).inc()
+        raise Overloaded(reason, retry_after)
+
+    def admit(self, session_id: Optional[str], parcels: int = 1) -> None:
+        """
+        Count a request of ``parcels`` parcels in flight or raise `Overloaded`;
+        call `release` once it has published.
+        """
+        if not self.enabled:
+            return
+        if self.in_flight >= self.max_in_flight:
+            self._reject("in_flight", 1)
+        state = self.state
+        if state == SHEDDING:
+            self._reject("queue_depth", self.retry_after)
+        if state == THROTTLED:
+            wait = self.buckets.take(session_id or "", parcels)
+            if wait:
+                self._reject("rate_limit", max(1, math.ceil(wait)))
+        self.in_flight += 1
+
+    def release(self) -> None:
+        if self.enabled:
+            self.in_flight -= 1
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.sample_interval)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+def create_admission_controller() -> AdmissionController:
+    settings = get_settings()
+    return AdmissionController(
+        publisher.queue_counts,
+        enabled=settings.admission_enabled,
+        max_in_flight=settings.admission_max_in_flight,
+        soft_watermark=settings.admission_soft_watermark,
+        hard_watermark=settings.admission_hard_watermark,
+        session_rate=settings.admission_session_rate,
+        session_burst=settings.admission_session_burst,
+        retry_after=settings.admission_retry_after,
+        sample_interval=settings.admission_sample_interval,
+    )
+
+
+admission = create_admission_controller()
+
+Gauge(
+    "parcel_admission_queue_depth",
+    "Ready messages in parcel_queue at the last sample, -1 if unknown",
+    function=lambda: -1 if admission.depth is None else admission.depth,
+)
+Gauge(
+    "parcel_admission_queue_consumers",
+    "Consumers of parcel_queue at the last sample, -1 if unknown",
+    function=lambda: -1 if admission.consumers is None else admission.consumers,
+)
+Gauge(
+    "parcel_admission_in_flight",
+    "Intake requests of this process publishing",
+    function=lambda: admission.in_flight,
+)
+ADMISSION_WATERMARKS = Gauge(
+    "parcel_admission_watermark", "Queue depths where intake is limited", ("level",)
+)
+ADMISSION_WATERMARKS.labels("soft").set_function(lambda: admission.soft_watermark)
+ADMISSION_WATERMARKS.labels("hard").set_function(lambda: admission.hard_watermark)
+Gauge(
+    "parcel_admission_state",
+    "Intake state: 0 open, 1 throttled per session, 2 shedding",
+    function=lambda: _STATES.index(admission.state),
+)
@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from starlette.requests import Request
+
+from app.events import parcel_events
+
+router = APIRouter()
+
+
+@router.get("/parcels/events")
+async def get_parcel_events(request: Request) -> StreamingResponse:
+    """
+    Stream Server-Sent Events about the parcels of the current user's session.
+
+    A `parcel_saved` event with the parcel's `id` and `delivery_cost_cents` is sent when the consumer
+    has saved and priced a parcel, so clients don't need to poll `GET /parcels/my`. Comment lines are
+    sent as a heartbeat while there are no events.
+
+    An `overflow` event means the client fell behind and the stream is closed: reload the parcels
+    with `GET /parcels/my` and reconnect. Events aren't replayed, so reload after any reconnect.
+    """
+    return StreamingResponse(
+        parcel_events.stream(request.state.session_id),
+        media_type="text/event-stream",
+        # Proxies must pass the events on as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
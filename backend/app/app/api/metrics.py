@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+
+from app.metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    return Response(content=REGISTRY.expose(), media_type=CONTENT_TYPE)
@@ -1,9 +1,29 @@
+import hashlib
+import uuid
+
 from loguru import logger
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Body, HTTPException, Query, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
 from starlette.requests import Request
 
-from app.models.pydantic import ParcelIn, ParcelOut
+from app.admission import Overloaded, admission
+from app.cache import PARCEL_DETAIL_FIELDS, parcel_cache, parcel_detail_json
+from app.export import EXPORT_MEDIA_TYPES, export_parcels
+from app.log import sampled
+from app.models.pydantic import (
+    ParcelBatchItemOut,
+    ParcelBatchOut,
+    ParcelIn,
+    ParcelInList,
+    ParcelOut,
+    ParcelOutList,
+    ParcelQuoteOut,
+    ParcelStatsGroupOut,
+    ParcelStatsOut,
+)
 from app.models.tortoise import (
     Parcel,
     Parcel_Pydantic,
@@ -11,10 +31,39 @@ from app.models.tortoise import (
     ParcelType_Pydantic,
     ParcelTypeIn_Pydantic,
 )
-from app.producer import send_to_queue
+from app.producer import batch_envelope, send_to_queue
+from app.registry import parcel_type_registry
+from app.stats import session_stats
+from app.utils import (
+    calculate_delivery_costs,
+    decode_cursor,
+    encode_cursor,
+    usd_rate_cache,
+)
 
+MAX_BATCH_PARCELS = 1_000
+MAX_QUOTE_PARCELS = 100_000
+EXPORT_CHUNK_SIZE = 1_000
+# Stats group of parcels whose type can't be resolved, such as a deleted one
+UNKNOWN_PARCEL_TYPE = "unknown"
+# Parcels only change when repriced, so clients may reuse a response briefly
+# and then revalidate it with the ETag
+PARCEL_CACHE_CONTROL = "private, max-age=60"
 
 router = APIRouter()
+sampled_logger = sampled()
+
+
+def admit(request: Request, parcels: int = 1) -> None:
+    """Admit an intake request with `admission`, or refuse it with a `Retry-After`."""
+    try:
+        admission.admit(request.state.session_id, parcels)
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=429 if e.reason == "rate_limit" else 503,
+            detail="Too many parcels are waiting to be processed, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
 
 @router.post("/parcels", status_code=202)
@@ -22,30 +71,155 @@ async def create_parcel(parcel_data: ParcelIn, request: Request) -> dict[str, st
     """
     Accept a parcel registration request.
 
+    The parcel ID is assigned here and returned right away, so the parcel can be fetched with
+    `GET /parcels/{parcel_id}` once it has been processed.
+
     - **parcel_data**: Parcel information including type, name, weight, and content value.
     - **request**: HTTP request object.
+
+    ### Errors
+    - `429 Too Many Requests`: Returned to sessions over their rate while the queue is backed up.
+    - `503 Service Unavailable`: Returned while the queue is too deep to accept more parcels.
     """
     data = parcel_data.dict()
-    logger.info(f"Creating parcel: {data}")
-    try:
-        parcel_type = await ParcelType.get(name=parcel_data.parcel_type)
-        data["parcel_type_id"] = parcel_type.id
-        logger.info(
-            f"Parcel type '{parcel_data.parcel_type}' found with ID {parcel_type.id}"
-        )
-    except ParcelType.DoesNotExist:
+    logger.debug("Creating parcel: {data}", data=data)
+    parcel_type_id = await parcel_type_registry.get_id(parcel_data.parcel_type)
+    if parcel_type_id is None:
         # Handle the case where the ParcelType is not found
         logger.error(f"Parcel type '{parcel_data.parcel_type}' not found")
         raise HTTPException(status_code=404, detail="Parcel type not found")
+    logger.debug(
+        "Parcel type '{}' found with ID {}", parcel_data.parcel_type, parcel_type_id
+    )
 
-    data["session_id"] = request.cookies.get("session_id")
+    data["session_id"] = request.state.session_id
     data["content_value_cents"] = parcel_data.value_in_cents()
-    data["parcel_type_id"]: parcel_type.id
+    data["parcel_type_id"] = parcel_type_id
+    data["id"] = str(uuid.uuid4())
 
+    admit(request)
     # Send data to Celery task
-    await send_to_queue(data)
+    try:
+        await send_to_queue(data)
+    finally:
+        admission.release()
+
+    return {"message": "Parcel accepted and will be processed", "id": data["id"]}
+
+
+@router.post("/parcels/batch", status_code=202, response_model=ParcelBatchOut)
+async def create_parcels_batch(
+    request: Request, parcels_data: list[dict] = Body(...)
+) -> ParcelBatchOut:
+    """
+    Accept up to `MAX_BATCH_PARCELS` parcel registrations in one request.
+
+    Every item is validated on its own and the valid ones are queued together as a single message.
 
-    return {"message": "Parcel accepted and will be processed"}
+    - **parcels_data**: List of parcels in the `POST /parcels` format.
+
+    ### Response
+    - `accepted`/`rejected` counts and, per input position, either the `id` the parcel will be saved
+      with or the `error` that rejected it.
+
+    ### Errors
+    - `413 Request Entity Too Large`: Returned if the list is longer than `MAX_BATCH_PARCELS`.
+    - `429`/`503`: Returned like `POST /parcels` when the queue is backed up.
+    """
+    if len(parcels_data) > MAX_BATCH_PARCELS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_BATCH_PARCELS} parcels per batch"
+        )
+
+    session_id = request.state.session_id
+    parcels, items = [], []
+    parcel_type_ids: dict[str, int | None] = {}
+    for index, item in enumerate(parcels_data):
+        try:
+            parcel_data = ParcelIn.model_validate(item)
+        except ValidationError as e:
+            error = "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+            )
+            items.append(ParcelBatchItemOut(index=index, error=error))
+            continue
+
+        if parcel_data.parcel_type not in parcel_type_ids:
+            parcel_type_ids[parcel_data.parcel_type] = (
+                await parcel_type_registry.get_id(parcel_data.parcel_type)
+            )
+        parcel_type_id = parcel_type_ids[parcel_data.parcel_type]
+        if parcel_type_id is None:
+            items.append(ParcelBatchItemOut(index=index, error="Parcel type not found"))
+            continue
+
+        data = parcel_data.dict()
+        data["id"] = str(uuid.uuid4())
+        data["session_id"] = session_id
+        data["content_value_cents"] = parcel_data.value_in_cents()
+        data["parcel_type_id"] = parcel_type_id
+        parcels.append(data)
+        items.append(ParcelBatchItemOut(index=index, id=data["id"]))
+
+    sampled_logger.info(
+        "Accepted {} of {} parcels in batch", len(parcels), len(parcels_data)
+    )
+    if parcels:
+        admit(request, len(parcels))
+        try:
+            await send_to_queue(batch_envelope(parcels))
+        finally:
+            admission.release()
+
+    return ParcelBatchOut(
+        accepted=len(parcels), rejected=len(items) - len(parcels), items=items
+    )
+
+
+@router.post("/parcels/quote", response_model=list[ParcelQuoteOut])
+async def quote_parcels(parcels_data: list[dict] = Body(...)) -> list[ParcelQuoteOut]:
+    """
+    Price a list of parcels without registering them.
+
+    All parcels are priced at once against a single USD rate lookup.
+
+    - **parcels_data**: Up to `MAX_QUOTE_PARCELS` parcels in the `POST /parcels` format.
+
+    ### Errors
+    - `413 Request Entity Too Large`: Returned if the list is longer than `MAX_QUOTE_PARCELS`.
+    - `422 Unprocessable Entity`: Returned if any parcel is invalid.
+    """
+    # The items are validated only once the length is checked, so an oversized
+    # list is refused before it costs a model per item
+    if len(parcels_data) > MAX_QUOTE_PARCELS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_QUOTE_PARCELS} parcels per quote"
+        )
+    try:
+        parcels_data = ParcelInList.validate_python(parcels_data)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [error | {"loc": ("body", *error["loc"])} for error in e.errors()]
+        )
+
+    values_in_cents = [parcel.value_in_cents() for parcel in parcels_data]
+    delivery_costs = calculate_delivery_costs(
+        [parcel.weight for parcel in parcels_data],
+        values_in_cents,
+        await usd_rate_cache.get(),
+    )
+
+    return [
+        ParcelQuoteOut(
+            name=parcel.name,
+            weight=parcel.weight,
+            content_value_cents=value_in_cents,
+            delivery_cost_cents=delivery_cost,
+        )
+        for parcel, value_in_cents, delivery_cost in zip(
+            parcels_data, values_in_cents, delivery_costs.tolist()
+        )
+    ]
 
 
 @router.get("/parcels/my", response_model=list[ParcelOut])
@@ -57,29 +231,117 @@ async def get_my_parcels(
     ),
     skip: int = 0,
     limit: int = 10,
+    cursor: str = Query(
+        None, description="Opaque cursor from the `X-Next-Cursor` header of a page"
+    ),
 ) -> list[ParcelOut]:
     """
     Retrieve a list of parcels associated with the current user's session.
 
     This endpoint retrieves parcels based on session ID, with optional filters for parcel type ID and delivery cost presence. Supports pagination through `skip` and `limit` parameters.
 
+    Parcels are ordered by ID. When a page is full, the `X-Next-Cursor` response header holds a cursor for the
+    next page; passing it as `cursor` seeks straight to that page instead of skipping rows, and `skip` is ignored.
+
     - **Response**: List of ParcelOut objects representing the parcels.
+
+    ### Errors
+    - `400 Bad Request`: Returned if the cursor is malformed.
     """
-    session_id = request.cookies.get("session_id")
-    query = Parcel.filter(session_id=session_id).prefetch_related("parcel_type")
+    session_id = request.state.session_id
+    query = Parcel.filter(session_id=session_id)
 
     if parcel_type_id is not None:
         query = query.filter(parcel_type_id=parcel_type_id)
     if has_delivery_cost is not None:
         query = query.filter(delivery_cost_cents__isnull=not has_delivery_cost)
 
-    parcels = await query.offset(skip).limit(limit).all()
-    result = [await ParcelOut.from_orm(parcel) for parcel in parcels]
-    return result
+    if cursor is not None:
+        try:
+            query = query.filter(id__gt=decode_cursor(cursor))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    else:
+        query = query.offset(skip)
+
+    # One JOINed query for the needed columns; rows are trusted, so they are
+    # serialized directly instead of being validated again as the response model
+    rows = await query.order_by("id").limit(limit).values(*ParcelOut.VALUES_FIELDS)
+    parcels = [ParcelOut.from_row(row) for row in rows]
+
+    response = Response(
+        content=ParcelOutList.dump_json(parcels), media_type="application/json"
+    )
+    if parcels and len(parcels) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(parcels[-1].id)
+    return response
+
+
+@router.get("/parcels/export")
+async def export_my_parcels(
+    request: Request,
+    format: str = Query(
+        "ndjson", pattern="^(ndjson|csv)$", description="`ndjson` or `csv`"
+    ),
+    parcel_type_id: int = Query(None, description="Filter by parcel type ID"),
+) -> StreamingResponse:
+    """
+    Stream the current session's parcels as NDJSON or CSV.
+
+    Parcels are ordered by ID and read from the database in chunks, so exports of any size are
+    streamed in constant memory instead of being paged through `GET /parcels/my`.
+    """
+    query = Parcel.filter(session_id=request.state.session_id)
+    if parcel_type_id is not None:
+        query = query.filter(parcel_type_id=parcel_type_id)
+
+    return StreamingResponse(
+        export_parcels(query, format, EXPORT_CHUNK_SIZE),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="parcels.{format}"'},
+    )
+
+
+@router.get("/parcels/stats", response_model=ParcelStatsOut)
+async def get_parcel_stats(request: Request) -> ParcelStatsOut:
+    """
+    Summarize the parcels associated with the current user's session.
+
+    Totals are computed by the database, grouped by parcel type and by whether the delivery cost
+    has been calculated yet, instead of by paging through `GET /parcels/my`.
+
+    ### Response
+    - Overall `count`, `total_weight`, `total_content_value_cents` and `total_delivery_cost_cents`,
+      and the same totals per `parcel_type` and `priced` status in `groups`. Parcels whose type
+      can't be resolved are grouped under `UNKNOWN_PARCEL_TYPE`.
+    """
+    groups = [
+        ParcelStatsGroupOut(
+            parcel_type=await parcel_type_registry.get_name(row["parcel_type_id"])
+            or UNKNOWN_PARCEL_TYPE,
+            priced=row["priced"],
+            count=row["count"],
+            total_weight=row["total_weight"],
+            total_content_value_cents=row["total_content_value_cents"],
+            total_delivery_cost_cents=row["total_delivery_cost_cents"],
+        )
+        for row in await session_stats(request.state.session_id)
+    ]
+    return ParcelStatsOut(
+        count=sum(group.count for group in groups),
+        total_weight=sum(group.total_weight for group in groups),
+        total_content_value_cents=sum(
+            group.total_content_value_cents for group in groups
+        ),
+        total_delivery_cost_cents=sum(
+            group.total_delivery_cost_cents for group in groups
+        ),
+        groups=groups,
+    )
 
 
 @router.get("/parcels/{parcel_id}", response_model=Parcel_Pydantic)
-async def get_parcel_details(parcel_id: str) -> Parcel_Pydantic:
+async def get_parcel_details(parcel_id: str, request: Request) -> Parcel_Pydantic:
     """
     Retrieve detailed information about a specific parcel using its unique identifier.
 
@@ -91,14 +353,24 @@ async def get_parcel_details(parcel_id: str) -> Parcel_Pydantic:
     ### Response
     - A `Parcel_Pydantic` object containing detailed information about the parcel.
     - If the parcel with the specified ID is not found, a 404 error with a "Parcel not found" message is returned.
+    - Responses carry an `ETag`; sending it back in `If-None-Match` returns `304 Not Modified`.
 
     ### Errors
     - `404 Not Found`: Returned if no parcel is found with the given ID.
     """
-    parcel = await Parcel.filter(id=parcel_id).prefetch_related("parcel_type").first()
-    if not parcel:
-        raise HTTPException(status_code=404, detail="Parcel not found")
-    return await Parcel_Pydantic.from_tortoise_orm(parcel)
+    body = await parcel_cache.get(parcel_id)
+    if body is None:
+        parcel = await Parcel.filter(id=parcel_id).first().values(*PARCEL_DETAIL_FIELDS)
+        if not parcel:
+            raise HTTPException(status_code=404, detail="Parcel not found")
+        body = parcel_detail_json(parcel)
+        await parcel_cache.put(parcel_id, body)
+
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": PARCEL_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.post("/parcel_types", response_model=ParcelType_Pydantic)
@@ -113,15 +385,24 @@ async def create_parcel_type(parcel_data: ParcelTypeIn_Pydantic):
     - JSON object of the created parcel type with its ID and name.
     """
     parcel = await ParcelType.create(**parcel_data.model_dump(exclude_unset=True))
+    await parcel_type_registry.publish_invalidation()
 
     return await ParcelType_Pydantic.from_tortoise_orm(parcel)
 
 
 @router.get("/parcel_types", response_model=list[ParcelType_Pydantic])
-async def get_parcel_types():
+async def get_parcel_types(request: Request):
     """
     Retrieve a list of all available parcel types.
 
     Each type includes an identifier and the name of the type.
+
+    The response carries an `ETag`; sending it back in `If-None-Match` returns `304 Not Modified`
+    while the list is unchanged.
     """
-    return await ParcelType_Pydantic.from_queryset(ParcelType.all())
+    parcel_types = await parcel_type_registry.all()
+    etag = f'"{parcel_type_registry.etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=parcel_types, headers=headers)
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from app.config import get_settings
+from app.metrics import Gauge
+from app.models.tortoise import Parcel_Pydantic
+from app.utils import ASYNC_REDIS_CLIENT, pubsub_messages
+
+
+PARCEL_KEY_PREFIX = "parcel:"
+PARCEL_CACHE_CHANNEL = "parcel_cache:invalidate"
+# Columns to select with `Parcel.filter(...).values(*PARCEL_DETAIL_FIELDS)`
+PARCEL_DETAIL_FIELDS = tuple(Parcel_Pydantic.model_fields)
+
+
+def parcel_detail_json(parcel: Any) -> bytes:
+    """Serialize a `Parcel` or a `PARCEL_DETAIL_FIELDS` row as GET /parcels/{id} does."""
+    return Parcel_Pydantic.model_validate(parcel).model_dump_json().encode()
+
+
+class ParcelCache:
+    """
+    Two-tier cache of serialized GET /parcels/{id} responses.
+
+    The first tier is a per-process LRU bounded by item count and total
+    bytes, the second is Redis shared by every process. Parcels only change
+    when they are repriced; `invalidate` then drops their entries from Redis
+    and publishes their IDs on `PARCEL_CACHE_CHANNEL`, so that every process
+    listening there drops its local copies too. Redis errors turn the shared
+    tier off for `retry_after` seconds instead of failing the request.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        max_items: int = 10_000,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl: int = 86400,
+        retry_after: float = 5.0,
+    ):
+        self.redis = redis
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.retry_after = retry_after
+
+        self.bytes = 0
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._redis_down_until = 0.0
+        self._listener: Optional[asyncio.Task] = None
+
+    def _put_local(self, parcel_id: str, body: bytes) -> None:
+        previous = self._items.pop(parcel_id, None)
+        if previous is not None:
+            self.bytes -= len(previous)
+        self._items[parcel_id] = body
+        self.bytes += len(body)
+        while len(self._items) > self.max_items or self.bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e: Exception) -> None:
+        logger.error(f"Parcel cache Redis tier unavailable: {e}")
+        self._redis_down_until = time.monotonic() + self.retry_after
+
+    async def get(self, parcel_id: str) -> Optional[bytes]:
+        body = self._items.get(parcel_id)
+        if body is not None:
+            self._items.move_to_end(parcel_id)
+            self.local_hits += 1
+            return body
+
+        if self._redis_available():
+            try:
+                body = await self.redis.get(PARCEL_KEY_PREFIX + parcel_id)
+            except Exception as e:
+                self._redis_failed(e)
+            if body is not None:
+                self._put_local(parcel_id, body)
+                self.redis_hits += 1
+                return body
+
+        self.misses += 1
+        return None
+
+    async def put(self, parcel_id: str, body: bytes) -> None:
+        self._put_local(parcel_id, body)
+        await self.put_shared({parcel_id: body})
+
+    async def put_shared(self, bodies: dict[str, bytes]) -> None:
+        """Write entries to the Redis tier only, in one round-trip."""
+        if not bodies or not self._redis_available():
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for parcel_id, body in bodies.items():
+                    pipe.set(PARCEL_KEY_PREFIX + parcel_id, body, ex=self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            self._redis_failed(e)
+
+    def _drop_local(self, parcel_ids: list[str]) -> None:
+        for parcel_id in parcel_ids:
+            body = self._items.pop(parcel_id, None)
+            if body is not None:
+                self.bytes -= len(body)
+
+    async def invalidate(self, parcel_ids: list[str]) -> None:
+        """Drop entries from both tiers in every process."""
+        if not parcel_ids:
+            return
+        self._drop_local(parcel_ids)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(
+                    *(PARCEL_KEY_PREFIX + parcel_id for parcel_id in parcel_ids)
+                )
+                pipe.publish(PARCEL_CACHE_CHANNEL, json.dumps(parcel_ids))
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error invalidating {len(parcel_ids)} cached parcels: {e}")
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(PARCEL_CACHE_CHANNEL)
+                    # Invalidations may have been missed while disconnected
+                    self.clear()
+                    async for message in pubsub_messages(pubsub):
+                        if message["type"] == "message":
+                            self._drop_local(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Parcel cache listener disconnected: {e}")
+                await asyncio.sleep(self.retry_after)
+
+    def start(self) -> None:
+        """Start listening for invalidations published by other processes."""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def clear(self) -> None:
+        self._items.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": (
+                (self.local_hits + self.redis_hits) / lookups if lookups else 0.0
+            ),
+            "items": len(self._items),
+            "bytes": self.bytes,
+        }
+
+
+def create_parcel_cache() -> ParcelCache:
+    settings = get_settings()
+    return ParcelCache(
+        ASYNC_REDIS_CLIENT,
+        max_items=settings.parcel_cache_max_items,
+        max_bytes=settings.parcel_cache_max_bytes,
+        ttl=settings.parcel_cache_ttl,
+    )
+
+
+parcel_cache = create_parcel_cache()
+
+PARCEL_CACHE_LOOKUPS = Gauge(
+    "parcel_cache_lookups", "GET /parcels/{id} cache lookups by result", ("result",)
+)
+for result in ("local_hits", "redis_hits", "misses"):
+    PARCEL_CACHE_LOOKUPS.labels(result).set_function(
+        lambda result=result: parcel_cache.stats()[result]
+    )
+Gauge(
+    "parcel_cache_hit_ratio",
+    "Share of parcel cache lookups served from either tier",
+    function=lambda: parcel_cache.stats()["hit_ratio"],
+)
+Gauge(
+    "parcel_cache_items",
+    "Entries in the local parcel cache",
+    function=lambda: parcel_cache.stats()["items"],
+)
+Gauge(
+    "parcel_cache_bytes",
+    "Bytes held by the local parcel cache",
+    function=lambda: parcel_cache.bytes,
+)
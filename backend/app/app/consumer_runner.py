@@ -0,0 +1,225 @@
+"""
+Run several consumer processes, optionally scaled with the queue depth.
+
+    python -m app.consumer_runner --workers 4 --prefetch 200 --concurrency 50
+    python -m app.consumer_runner --autoscale --min-workers 1 --max-workers 8
+
+Each worker is an `app.consumer.Consumer` in its own process. On SIGTERM or
+SIGINT the runner forwards SIGTERM to every worker, which stops consuming,
+finishes its in-flight messages and closes its connections.
+"""
+
+import argparse
+import asyncio
+import math
+import multiprocessing
+import signal
+import time
+from multiprocessing.process import BaseProcess
+from typing import Optional
+
+from aio_pika import connect
+from loguru import logger
+
+from app.consumer import create_consumer, run
+from app.config import get_settings
+from app.log import configure_logging
+from app.producer import QUEUE_NAME
+
+
+def worker_main(
+    metrics_port: Optional[int], prefetch_count: int, concurrency: int
+) -> None:
+    configure_logging()
+    asyncio.run(run(create_consumer(prefetch_count, concurrency), metrics_port))
+
+
+def desired_workers(
+    queue_depth: int, messages_per_worker: int, min_workers: int, max_workers: int
+) -> int:
+    """Number of workers needed to drain ``queue_depth`` messages."""
+    wanted = math.ceil(queue_depth / messages_per_worker)
+    return max(min_workers, min(max_workers, wanted))
+
+
+class ConsumerRunner:
+    """
+    Keeps ``workers`` consumer processes alive and resizes the pool.
+
+    Worker ``n`` serves its metrics on ``metrics_port + n``. The pool is
+    grown right away but shrunk by one worker per `resize` call, so a
+    briefly empty queue doesn't stop every worker at once. A stopped worker
+    gets ``stop_timeout`` seconds to drain before it is killed, and is
+    reaped before its slot and port are given to a new one.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        prefetch_count: int,
+        concurrency: int,
+        metrics_port: Optional[int] = None,
+        stop_timeout: float = 60.0,
+    ):
+        self.workers = workers
+        self.prefetch_count = prefetch_count
+        self.concurrency = concurrency
+        self.metrics_port = metrics_port
+        self.stop_timeout = stop_timeout
+        self._processes: list[BaseProcess] = []
+        # Workers shrunk away by the slot they held, with their kill deadline
+        self._stopping: dict[int, tuple[BaseProcess, float]] = {}
+        self._context = multiprocessing.get_context("spawn")
+
+    def _spawn(self, index: int) -> BaseProcess:
+        port = self.metrics_port + index if self.metrics_port else None
+        process = self._context.Process(
+            target=worker_main,
+            args=(port, self.prefetch_count, self.concurrency),
+            name=f"consumer-{index}",
+        )
+        process.start()
+        logger.info(f"Started {process.name} (pid {process.pid})")
+        return process
+
+    def _replace_exited(self) -> None:
+        for index, process in enumerate(self._processes):
+            if not process.is_alive():
+                logger.warning(
+                    f"{process.name} exited with code {process.exitcode}, restarting"
+                )
+                self._processes[index] = self._spawn(index)
+
+    def _reap(self, process: BaseProcess) -> None:
+        """Collect a terminated worker, killing it if it is still draining."""
+        if process.is_alive():
+            logger.warning(f"{process.name} did not drain in time, killing it")
+            process.kill()
+        process.join()
+
+    async def _join(self, process: BaseProcess, deadline: float) -> None:
+        """Wait for a terminated worker to exit, killing it at ``deadline``."""
+        while process.is_alive() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        self._reap(process)
+
+    def _reap_stopped(self) -> None:
+        for index, (process, deadline) in list(self._stopping.items()):
+            if process.is_alive() and time.monotonic() < deadline:
+                continue
+            self._reap(process)
+            del self._stopping[index]
+
+    async def resize(self, workers: int) -> None:
+        self._reap_stopped()
+        self._replace_exited()
+        while len(self._processes) < workers:
+            index = len(self._processes)
+            if index in self._stopping:
+                # The worker shrunk away from this slot still holds its port
+                await self._join(*self._stopping.pop(index))
+            self._processes.append(self._spawn(index))
+        if workers < len(self._processes):
+            process = self._processes.pop()
+            logger.info(f"Stopping {process.name}")
+            process.terminate()
+            self._stopping[len(self._processes)] = (
+                process,
+                time.monotonic() + self.stop_timeout,
+            )
+        self.workers = workers
+
+    async def stop(self) -> None:
+        """Send SIGTERM to every worker and wait for them to drain."""
+        for process in self._processes:
+            process.terminate()
+        deadline = time.monotonic() + self.stop_timeout
+        stopping = [(process, deadline) for process in self._processes]
+        stopping.extend(self._stopping.values())
+        for process, process_deadline in stopping:
+            await self._join(process, process_deadline)
+        self._processes = []
+        self._stopping = {}
+        logger.info("All consumer workers stopped.")
+
+
+async def queue_depth(url: str, queue_name: str = QUEUE_NAME) -> int:
+    """Messages ready in ``queue_name``, read with a passive declare."""
+    connection = await connect(url)
+    try:
+        channel = await connection.channel()
+        queue = await channel.declare_queue(queue_name, passive=True)
+        return queue.declaration_result.message_count
+    finally:
+        await connection.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings = get_settings()
+    runner = ConsumerRunner(
+        args.workers,
+        args.prefetch,
+        args.concurrency,
+        args.metrics_port,
+        # Time for the worker's own drain, then for closing its connections
+        stop_timeout=settings.consumer_drain_timeout + 10,
+    )
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    await runner.resize(args.workers)
+    while not stopping.is_set():
+        try:
+            await asyncio.wait_for(stopping.wait(), args.interval)
+        except asyncio.TimeoutError:
+            pass
+        if stopping.is_set():
+            break
+        workers = runner.workers
+        if args.autoscale:
+            try:
+                depth = await queue_depth(settings.rabbitmq_url)
+                workers = desired_workers(
+                    depth, args.messages_per_worker, args.min_workers, args.max_workers
+                )
+            except Exception as e:
+                logger.error(f"Error reading queue depth: {e}")
+        await runner.resize(workers)
+
+    await runner.stop()
+
+
+if __name__ == "__main__":
+    settings = get_settings()
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", type=int, default=settings.consumer_min_workers)
+    parser.add_argument(
+        "--prefetch", type=int, default=settings.consumer_prefetch_count
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=settings.consumer_concurrency
+    )
+    parser.add_argument("--autoscale", action="store_true")
+    parser.add_argument(
+        "--min-workers", type=int, default=settings.consumer_min_workers
+    )
+    parser.add_argument(
+        "--max-workers", type=int, default=settings.consumer_max_workers
+    )
+    parser.add_argument(
+        "--messages-per-worker",
+        type=int,
+        default=settings.consumer_messages_per_worker,
+    )
+    parser.add_argument(
+        "--interval", type=float, default=settings.consumer_autoscale_interval
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=settings.consumer_metrics_port
+    )
+    configure_logging()
+    asyncio.run(main(parser.parse_args()))
@@ -1,27 +1,107 @@
+"""
+Tortoise configuration with optional read/write splitting.
+
+``DATABASE_URL`` is the primary, registered as the ``default`` connection.
+When ``DATABASE_REPLICA_URL`` is set as well, the API registers the replica
+as a second connection and `ReadWriteRouter` sends reads there while writes,
+and every query inside a transaction on the primary, stay on the primary.
+Code that must see its own writes reads in `read_from_primary()`. The pool
+of each role is sized with ``DATABASE_WRITE_POOL_SIZE`` and
+``DATABASE_READ_POOL_SIZE``.
+"""
+
 import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Sequence
+from urllib.parse import parse_qsl, urlencode, urlsplit
 
 from fastapi import FastAPI
 from loguru import logger
-from tortoise import Tortoise, run_async
+from tortoise import Tortoise, connections, run_async
+from tortoise.backends.base.client import BaseTransactionWrapper
 from tortoise.contrib.fastapi import register_tortoise
 
+from app.config import get_settings
+
+
+WRITE_CONNECTION = "default"
+READ_CONNECTION = "replica"
+
+_read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+
+@contextmanager
+def read_from_primary() -> Iterator[None]:
+    """Route the reads of the current task to the primary."""
+    token = _read_from_primary.set(True)
+    try:
+        yield
+    finally:
+        _read_from_primary.reset(token)
+
+
+class ReadWriteRouter:
+    """Tortoise router sending reads to the replica and writes to the primary."""
+
+    def db_for_read(self, model) -> str:
+        if _read_from_primary.get() or isinstance(
+            connections.get(WRITE_CONNECTION), BaseTransactionWrapper
+        ):
+            return WRITE_CONNECTION
+        return READ_CONNECTION
+
+    def db_for_write(self, model) -> str:
+        return WRITE_CONNECTION
+
+
+def with_pool_size(url: Optional[str], pool_size: Optional[int]) -> Optional[str]:
+    """Set the maximum pool size of a database URL; SQLite has no pool."""
+    if url is None or pool_size is None or url.startswith("sqlite"):
+        return url
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != "maxsize"]
+    query.append(("maxsize", str(pool_size)))
+    return parts._replace(query=urlencode(query)).geturl()
+
+
+def database_config(
+    modules: Sequence[str] = ("app.models.tortoise",), replica: bool = True
+) -> dict:
+    """
+    Tortoise config for the primary and, with ``replica`` and
+    ``DATABASE_REPLICA_URL`` set, the replica.
+    """
+    settings = get_settings()
+    config = {
+        "connections": {
+            WRITE_CONNECTION: with_pool_size(
+                os.getenv("DATABASE_URL"), settings.database_write_pool_size
+            )
+        },
+        "apps": {
+            "models": {
+                "models": list(modules),
+                "default_connection": WRITE_CONNECTION,
+            }
+        },
+    }
+    replica_url = os.getenv("DATABASE_REPLICA_URL") if replica else None
+    if replica_url:
+        config["connections"][READ_CONNECTION] = with_pool_size(
+            replica_url, settings.database_read_pool_size
+        )
+        config["routers"] = [ReadWriteRouter]
+    return config
+
 
-TORTOISE_ORM = {
-    "connections": {"default": os.getenv("DATABASE_URL")},
-    "apps": {
-        "models": {
-            "models": ["app.models.tortoise", "aerich.models"],
-            "default_connection": "default",
-        }
-    },
-}
+TORTOISE_ORM = database_config(("app.models.tortoise", "aerich.models"), replica=False)
 
 
 def init_db(app: FastAPI) -> None:
     register_tortoise(
         app,
-        db_url=os.environ.get("DATABASE_URL"),
-        modules={"models": ["app.models.tortoise"]},
+        config=database_config(),
         generate_schemas=False,
         add_exception_handlers=True,
     )
@@ -0,0 +1,98 @@
+"""
+Inspect and replay the dead-letter queue of parcel_queue.
+
+    python -m app.dead_letters count
+    python -m app.dead_letters replay --limit 10000 --batch-size 500
+
+Replayed messages are published back to parcel_queue with their attempt
+count reset, `batch_size` at a time, and removed from the dead-letter
+queue only once the broker has confirmed them.
+"""
+
+import argparse
+import asyncio
+from typing import Optional
+
+from aio_pika import DeliveryMode, Message, connect
+from aio_pika.abc import AbstractChannel
+from loguru import logger
+
+from app.config import get_settings
+from app.log import configure_logging
+from app.producer import QUEUE_NAME, dead_letter_queue_name, declare_parcel_queue
+from app.retry import retry_headers
+
+
+async def count(channel: AbstractChannel, queue_name: str = QUEUE_NAME) -> int:
+    queue = await channel.get_queue(dead_letter_queue_name(queue_name))
+    return queue.declaration_result.message_count
+
+
+async def replay(
+    channel: AbstractChannel,
+    limit: Optional[int] = None,
+    batch_size: int = 500,
+    queue_name: str = QUEUE_NAME,
+) -> int:
+    """Move up to ``limit`` dead-lettered messages back to ``queue_name``."""
+    dead_letters = await channel.get_queue(dead_letter_queue_name(queue_name))
+    replayed = 0
+    while limit is None or replayed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - replayed)
+        batch = []
+        while len(batch) < size:
+            message = await dead_letters.get(no_ack=False, fail=False)
+            if message is None:
+                break
+            batch.append(message)
+        if not batch:
+            break
+
+        await asyncio.gather(
+            *(
+                channel.default_exchange.publish(
+                    Message(
+                        body=message.body,
+                        headers=retry_headers(message, 0),
+                        content_type=message.content_type,
+                        delivery_mode=DeliveryMode.PERSISTENT,
+                    ),
+                    routing_key=queue_name,
+                )
+                for message in batch
+            )
+        )
+        await batch[-1].ack(multiple=True)
+        replayed += len(batch)
+        logger.info(f"Replayed {replayed} dead-lettered messages")
+    return replayed
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings = get_settings()
+    connection = await connect(settings.rabbitmq_url)
+    try:
+        channel = await connection.channel(publisher_confirms=True)
+        await declare_parcel_queue(channel, settings.consumer_retry_delays_ms)
+        if args.command == "count":
+            print(await count(channel))
+        else:
+            replayed = await replay(channel, args.limit, args.batch_size)
+            print(f"Replayed {replayed} messages to {QUEUE_NAME}")
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("count", help="Print the number of dead-lettered messages")
+    replay_parser = subparsers.add_parser(
+        "replay", help="Publish dead-lettered messages back to parcel_queue"
+    )
+    replay_parser.add_argument("--limit", type=int, default=None)
+    replay_parser.add_argument("--batch-size", type=int, default=500)
+    configure_logging()
+    asyncio.run(main(parser.parse_args()))
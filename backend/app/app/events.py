@@ -0,0 +1,206 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from app.config import get_settings
+from app.metrics import Counter, Gauge
+from app.models.tortoise import Parcel
+from app.utils import ASYNC_REDIS_CLIENT, pubsub_messages
+
+
+PARCEL_EVENTS_CHANNEL = "parcel_events"
+
+PARCEL_EVENTS_DELIVERED = Counter(
+    "parcel_events_delivered", "Parcel saved events queued for event streams"
+)
+PARCEL_EVENTS_DROPPED = Counter(
+    "parcel_events_dropped", "Parcel saved events not published while Redis failed"
+)
+PARCEL_EVENT_OVERFLOWS = Counter(
+    "parcel_event_overflows", "Event streams closed because the client fell behind"
+)
+
+
+# What a stream sends of a published event; the session id only routes it, as
+# it is the session cookie, which page scripts must not be able to read
+PARCEL_SAVED_FIELDS = ("id", "delivery_cost_cents")
+
+
+def format_event(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class Subscription:
+    """Events of one session waiting to be sent to one event stream."""
+
+    def __init__(self, session_id: str, max_queued: int):
+        self.session_id = session_id
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(max_queued)
+        self.overflowed = False
+
+    def deliver(self, event: dict) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            PARCEL_EVENT_OVERFLOWS.inc()
+        else:
+            PARCEL_EVENTS_DELIVERED.inc()
+
+
+class ParcelEventHub:
+    """
+    Fans out "parcel saved" events from the consumers to GET /parcels/events.
+
+    Consumers publish the parcels of each committed message on
+    `PARCEL_EVENTS_CHANNEL`. Every API process holds a single subscription to
+    it, however many streams it serves, and queues each event for the streams
+    of the parcel's session. A stream sends a comment line every
+    ``heartbeat_interval`` seconds while idle so that proxies keep it open.
+
+    At most ``max_queued`` events wait per stream. A client that falls further
+    behind is sent an ``overflow`` event and disconnected instead of buffering
+    without bound; it should reload its parcels and reconnect. Events aren't
+    stored, so the same applies after any reconnect.
+
+    Publishing never holds up a consumer for long: after a Redis error the
+    hub drops events for ``retry_after`` seconds instead of trying again.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        max_queued: int = 100,
+        heartbeat_interval: float = 15.0,
+        reconnect_delay: float = 1.0,
+        retry_after: float = 5.0,
+    ):
+        self.redis = redis
+        self.max_queued = max_queued
+        self.heartbeat_interval = heartbeat_interval
+        self.reconnect_delay = reconnect_delay
+        self.retry_after = retry_after
+        self._redis_down_until = 0.0
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    async def publish_saved(self, parcels: list[Parcel]) -> None:
+        """Announce committed parcels; parcels without a session are skipped."""
+        events = [
+            {
+                "id": str(parcel.id),
+                "session_id": parcel.session_id,
+                "delivery_cost_cents": parcel.delivery_cost_cents,
+            }
+            for parcel in parcels
+            if parcel.session_id is not None
+        ]
+        if not events:
+            return
+        if time.monotonic() < self._redis_down_until:
+            PARCEL_EVENTS_DROPPED.inc(len(events))
+            return
+        try:
+            await self.redis.publish(PARCEL_EVENTS_CHANNEL, json.dumps(events))
+        except Exception as e:
+            logger.error(f"Error publishing parcel events: {e}")
+            PARCEL_EVENTS_DROPPED.inc(len(events))
+            self._redis_down_until = time.monotonic() + self.retry_after
+
+    def subscribe(self, session_id: str) -> Subscription:
+        subscription = Subscription(session_id, self.max_queued)
+        self._subscriptions.setdefault(session_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.session_id, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self._subscriptions.pop(subscription.session_id, None)
+
+    def dispatch(self, events: list[dict]) -> None:
+        """Queue published events for the streams of their sessions."""
+        for event in events:
+            subscriptions = self._subscriptions.get(event["session_id"])
+            if not subscriptions:
+                continue
+            data = {field: event.get(field) for field in PARCEL_SAVED_FIELDS}
+            for subscription in subscriptions:
+                subscription.deliver(data)
+
+    async def stream(self, session_id: str) -> AsyncIterator[bytes]:
+        """Server-sent events of ``session_id`` until the client disconnects."""
+        subscription = self.subscribe(session_id)
+        try:
+            # Lets clients and proxies see the response start right away
+            yield b": connected\n\n"
+            while True:
+                if subscription.overflowed:
+                    yield format_event("overflow", {})
+                    return
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), self.heartbeat_interval
+                    )
+                except asyncio.TimeoutError:
+                    yield b": heartbeat\n\n"
+                    continue
+                yield format_event("parcel_saved", event)
+        finally:
+            self.unsubscribe(subscription)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(PARCEL_EVENTS_CHANNEL)
+                    async for message in pubsub_messages(pubsub):
+                        if message["type"] == "message":
+                            self.dispatch(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Parcel events listener disconnected: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+
+    def start(self) -> None:
+        """Start receiving the events published by the consumers."""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+def create_parcel_event_hub() -> ParcelEventHub:
+    settings = get_settings()
+    return ParcelEventHub(
+        ASYNC_REDIS_CLIENT,
+        max_queued=settings.parcel_events_max_queued,
+        heartbeat_interval=settings.parcel_events_heartbeat_interval,
+    )
+
+
+parcel_events = create_parcel_event_hub()
+
+PARCEL_EVENT_SUBSCRIBERS = Gauge(
+    "parcel_event_subscribers",
+    "Open GET /parcels/events streams",
+    function=lambda: parcel_events.subscribers,
+)
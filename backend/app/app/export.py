@@ -0,0 +1,84 @@
+"""
+Streaming export of parcels as NDJSON or CSV.
+
+Rows are read with a keyset scan in chunks of ``chunk_size``: every chunk is
+a separate short query ordered by id, so an export holds no transaction and
+borrows a pooled connection only while a chunk is fetched. Each chunk is
+serialized to bytes at once and nothing else is kept, so memory doesn't grow
+with the size of the export.
+"""
+
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from tortoise.queryset import QuerySet
+
+from app.models.tortoise import Parcel
+from app.registry import parcel_type_registry
+
+
+EXPORT_FIELDS = (
+    "id",
+    "name",
+    "weight",
+    "content_value_cents",
+    "delivery_cost_cents",
+    "parcel_type",
+)
+# Columns to select; parcel types are named from the registry instead of a JOIN.
+# The session ID is the signed session cookie, so it is never exported.
+_SELECT_FIELDS = EXPORT_FIELDS[:-1] + ("parcel_type_id",)
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def parcel_chunks(
+    query: QuerySet[Parcel], chunk_size: int = 1_000
+) -> AsyncIterator[list[dict]]:
+    """Rows of ``query`` in id order, ``chunk_size`` at a time."""
+    names: dict[int, str] = {}
+    last_id = None
+    while True:
+        chunk_query = query if last_id is None else query.filter(id__gt=last_id)
+        rows = (
+            await chunk_query.order_by("id").limit(chunk_size).values(*_SELECT_FIELDS)
+        )
+        if not rows:
+            return
+        for row in rows:
+            row["id"] = str(row["id"])
+            parcel_type_id = row.pop("parcel_type_id")
+            if parcel_type_id not in names:
+                names[parcel_type_id] = await parcel_type_registry.get_name(
+                    parcel_type_id
+                )
+            row["parcel_type"] = names[parcel_type_id]
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def ndjson_chunk(rows: list[dict]) -> bytes:
+    return "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+
+def csv_chunk(rows: list[dict]) -> bytes:
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, EXPORT_FIELDS).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def export_parcels(
+    query: QuerySet[Parcel], format: str = "ndjson", chunk_size: int = 1_000
+) -> AsyncIterator[bytes]:
+    """Serialize the parcels of ``query`` chunk by chunk as ``format``."""
+    if format == "csv":
+        yield (",".join(EXPORT_FIELDS) + "\r\n").encode()
+        serialize = csv_chunk
+    else:
+        serialize = ndjson_chunk
+    async for rows in parcel_chunks(query, chunk_size):
+        yield serialize(rows)
@@ -0,0 +1,153 @@
+"""
+Logging setup shared by the API and the consumer.
+
+Records are handed to a background thread that formats and writes them, so
+a log call on the request path costs a queue put. High-frequency INFO
+events go through `sampled` loggers, and payloads are passed as format
+arguments so they are only stringified when their level is enabled.
+"""
+
+import json
+import queue
+import sys
+import threading
+from typing import Any, Optional, TextIO
+
+from loguru import logger
+
+from app.config import get_settings
+from app.metrics import Counter
+
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped", "Log records dropped because the log queue was full"
+)
+TEXT_FORMAT = "{time} | {level:<8} | {name}:{function}:{line} - {message}"
+
+
+def format_record(record: dict, serialize: bool) -> str:
+    error = None
+    if record["exception"] is not None:
+        exc_type, exc_value, _ = record["exception"]
+        error = f"{exc_type.__name__}: {exc_value}"
+
+    if serialize:
+        fields = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "logger": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": record["message"],
+        }
+        fields.update(record["extra"])
+        if error is not None:
+            fields["exception"] = error
+        return json.dumps(fields, default=str) + "\n"
+
+    line = TEXT_FORMAT.format(
+        time=record["time"].isoformat(),
+        level=record["level"].name,
+        name=record["name"],
+        function=record["function"],
+        line=record["line"],
+        message=record["message"],
+    )
+    return line + ("" if error is None else f"\n{error}") + "\n"
+
+
+class BackgroundSink:
+    """
+    Loguru sink writing records from a daemon thread.
+
+    The queue is bounded by `max_queue`; when the writer can't keep up new
+    records are dropped and counted rather than blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO = sys.stderr,
+        serialize: bool = True,
+        max_queue: int = 10_000,
+    ):
+        self.stream = stream
+        self.serialize = serialize
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._thread = threading.Thread(
+            target=self._run, name="log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, message: Any) -> None:
+        try:
+            self._queue.put_nowait(message.record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                self.stream.write(format_record(record, self.serialize))
+                if self._queue.empty():
+                    self.stream.flush()
+            except Exception as e:
+                sys.stderr.write(f"Error writing log record: {e}\n")
+
+    def stop(self) -> None:
+        """Write the queued records and stop the thread; called by `logger.remove`."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+class SampledLogger:
+    """
+    Emits one out of every `every` calls of each call site.
+
+    For INFO events fired per request or per message, where the rate of the
+    event matters more than each occurrence. Calls that are skipped cost a
+    frame lookup and a dict update.
+    """
+
+    def __init__(self, every: int):
+        self.every = every
+        self._logger = logger.opt(depth=2).bind(sampled=every)
+        self._counts: dict[tuple, int] = {}
+
+    def _log(self, level: str, message: str, args: tuple, kwargs: dict) -> None:
+        frame = sys._getframe(2)
+        key = (frame.f_code, frame.f_lineno)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % self.every == 0:
+            self._logger.log(level, message, *args, **kwargs)
+
+    def debug(self, message: str, *args, **kwargs) -> None:
+        self._log("DEBUG", message, args, kwargs)
+
+    def info(self, message: str, *args, **kwargs) -> None:
+        self._log("INFO", message, args, kwargs)
+
+
+def sampled(every: Optional[int] = None) -> SampledLogger:
+    """Return a logger sampling each call site, by default `log_sample_every`."""
+    return SampledLogger(every or get_settings().log_sample_every)
+
+
+def configure_logging() -> None:
+    """Replace loguru's default sink with the `BackgroundSink` from settings."""
+    settings = get_settings()
+    logger.remove()
+    logger.add(
+        BackgroundSink(
+            sys.stderr, serialize=settings.log_json, max_queue=settings.log_queue_size
+        ),
+        level=settings.log_level,
+        # The sink formats records itself, in its thread
+        format=lambda record: "{message}",
+        colorize=False,
+        backtrace=False,
+        diagnose=False,
+    )
@@ -1,15 +1,23 @@
 import os
 
-from app.api import health_check, parcel
+from app.admission import admission
+from app.api import events, health_check, metrics, parcel
+from app.cache import parcel_cache
+from app.config import get_settings
 from app.db import init_db
-from fastapi import FastAPI, Request
+from app.events import parcel_events
+from app.log import configure_logging
+from app.metrics import MetricsMiddleware
+from app.outbox import outbox
+from app.producer import publisher
+from app.registry import parcel_type_registry
+from app.session import ReadYourWritesMiddleware, SessionIdMiddleware
+from fastapi import FastAPI
 from loguru import logger
-from starlette.middleware.sessions import SessionMiddleware
 
 from app.utils import SessionManager
 from fastapi.middleware.cors import CORSMiddleware
 
-
 SECRET_KEY = os.getenv("APP_SECRET_KEY", "default-secret-key")
 
 ORIGINS = [
@@ -19,14 +27,22 @@ ORIGINS = [
 ]
 
 
+configure_logging()
+
 # Initialize your FastAPI app and session manager
 session_manager = SessionManager(SECRET_KEY)
 
 
 def create_app() -> FastAPI:
     application = FastAPI()
-    application.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
+    window = get_settings().read_your_writes_window
+    if window > 0:
+        application.add_middleware(ReadYourWritesMiddleware, window=window)
+    application.add_middleware(SessionIdMiddleware, session_manager=session_manager)
+    application.add_middleware(MetricsMiddleware)
     application.include_router(health_check.router)
+    application.include_router(metrics.router)
+    application.include_router(events.router)
     application.include_router(parcel.router)
 
     return application
@@ -44,23 +60,27 @@ app.add_middleware(
 )
 
 
-@app.middleware("http")
-async def add_session_id_to_request(request: Request, call_next):
-    session_id = request.cookies.get("session_id")
-    if not session_id or not session_manager.validate_session_id(session_id):
-        session_id = session_manager.create_session_id()
-        response = await call_next(request)
-        response.set_cookie(key="session_id", value=session_id, httponly=True)
-        return response
-    return await call_next(request)
-
-
 @app.on_event("startup")
 async def startup() -> None:
     logger.info("Starting up...")
     init_db(app)
+    if outbox.enabled:
+        # The relay connects the publisher, intake doesn't need the broker
+        outbox.start(publisher)
+    else:
+        await publisher.start()
+    parcel_type_registry.start()
+    parcel_events.start()
+    parcel_cache.start()
+    admission.start()
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
     logger.info("Shutting down...")
+    await admission.stop()
+    await parcel_type_registry.stop()
+    await parcel_events.stop()
+    await parcel_cache.stop()
+    await outbox.stop()
+    await publisher.close()
@@ -0,0 +1,302 @@
+"""
+Minimal Prometheus-style metrics.
+
+Recording is a dict lookup and a few additions, so it stays in the
+microsecond range and can be used on every request and message. Values
+are rendered in the Prometheus text exposition format by `REGISTRY.expose`.
+"""
+
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+from loguru import logger
+
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _format_labels(labelnames: tuple[str, ...], labelvalues: tuple[str, ...]) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(
+        f'{name}="{str(value)}"' for name, value in zip(labelnames, labelvalues)
+    )
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        registry: Optional["Registry"] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], "_Metric"] = {}
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *labelvalues: str):
+        child = self._children.get(labelvalues)
+        if child is None:
+            child = self._children[labelvalues] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self):
+        if not self.labelnames:
+            yield from self._child_samples(self, ())
+        for labelvalues, child in list(self._children.items()):
+            yield from self._child_samples(child, labelvalues)
+
+    def _child_samples(self, child, labelvalues):
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines += [f"{name}{labels} {value}" for name, labels, value in self._samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        self.value = 0.0
+        super().__init__(*args, **kwargs)
+
+    def _new_child(self):
+        child = Counter.__new__(Counter)
+        child.value = 0.0
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def _child_samples(self, child, labelvalues):
+        labels = _format_labels(self.labelnames, labelvalues)
+        yield f"{self.name}_total", labels, child.value
+
+
+class Gauge(_Metric):
+    """A gauge set explicitly or computed by a function at exposition time."""
+
+    type = "gauge"
+
+    def __init__(self, *args, function: Optional[Callable[[], float]] = None, **kwargs):
+        self.value = 0.0
+        self.function = function
+        super().__init__(*args, **kwargs)
+
+    def _new_child(self):
+        child = Gauge.__new__(Gauge)
+        child.value = 0.0
+        child.function = None
+        return child
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.function = function
+
+    def _child_samples(self, child, labelvalues):
+        value = child.function() if child.function is not None else child.value
+        yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        self.buckets = tuple(sorted(buckets))
+        self._reset(self)
+        super().__init__(*args, **kwargs)
+
+    def _reset(self, child) -> None:
+        # One slot per bucket plus +Inf; cumulative counts are built on exposition
+        child.buckets = self.buckets
+        child.counts = [0] * (len(self.buckets) + 1)
+        child.sum = 0.0
+        child.count = 0
+
+    def _new_child(self):
+        child = Histogram.__new__(Histogram)
+        self._reset(child)
+        return child
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        """Context manager observing the duration of its block in seconds."""
+        return _Timer(self)
+
+    def _child_samples(self, child, labelvalues):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            labels = _format_labels(self.labelnames + ("le",), labelvalues + (le,))
+            yield f"{self.name}_bucket", labels, cumulative
+        labels = _format_labels(self.labelnames, labelvalues)
+        yield f"{self.name}_sum", labels, child.sum
+        yield f"{self.name}_count", labels, child.count
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def expose(self) -> str:
+        return "\n".join(metric.expose() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency of every HTTP request per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched endpoint in the shared scope
+            endpoint = scope.get("endpoint")
+            route = getattr(endpoint, "__name__", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(
+                time.perf_counter() - started
+            )
+
+
+async def start_metrics_server(port: int, host: str = "0.0.0.0") -> asyncio.Server:
+    """Serve `REGISTRY` over plain HTTP for processes without a web app."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = REGISTRY.expose().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: %s\r\nContent-Length: %d\r\n"
+                b"Connection: close\r\n\r\n%s"
+                % (CONTENT_TYPE.encode(), len(body), body)
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"Error serving metrics: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Serving metrics on port {port}.")
+    return server
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ("method", "route", "status"),
+)
+PUBLISH_DURATION = Histogram(
+    "parcel_publish_duration_seconds",
+    "Time to publish a message to parcel_queue and get the broker confirm",
+)
+CONSUME_TO_COMMIT = Histogram(
+    "parcel_consume_to_commit_seconds",
+    "Time from receiving a message to committing its parcels",
+)
+QUEUE_LAG = Histogram(
+    "parcel_queue_lag_seconds",
+    "Time from publishing a message to the start of its processing",
+)
+DB_WRITE_DURATION = Histogram(
+    "parcel_db_write_seconds",
+    "Time spent writing parcels to the database",
+)
+RATE_LOOKUP_DURATION = Histogram(
+    "parcel_rate_lookup_seconds",
+    "Time spent resolving the USD rate",
+)
+PARCELS_PROCESSED = Counter("parcels_processed", "Parcels saved by the consumer")
+PARCELS_FAILED = Counter("parcels_failed", "Messages the consumer failed to process")
+PARCELS_RETRIED = Counter(
+    "parcels_retried", "Messages sent to a retry queue after a transient error"
+)
+PARCELS_DEAD_LETTERED = Counter(
+    "parcels_dead_lettered", "Messages sent to the dead-letter queue"
+)
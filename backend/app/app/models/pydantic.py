@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Any, ClassVar
+
+from pydantic import BaseModel, TypeAdapter
 
 from app.models.tortoise import ParcelIn_Pydantic, Parcel_Pydantic, ParcelType_Pydantic
 
@@ -18,6 +20,42 @@ class ParcelIn(ParcelIn_Pydantic, ParcelInWithTypeId):
         return int(self.content_value_cents * 100)
 
 
+class ParcelBatchItemOut(BaseModel):
+    index: int
+    id: str | None = None
+    error: str | None = None
+
+
+class ParcelBatchOut(BaseModel):
+    accepted: int
+    rejected: int
+    items: list[ParcelBatchItemOut]
+
+
+class ParcelQuoteOut(BaseModel):
+    name: str
+    weight: float
+    content_value_cents: int
+    delivery_cost_cents: int
+
+
+class ParcelStatsGroupOut(BaseModel):
+    parcel_type: str
+    priced: bool
+    count: int
+    total_weight: float
+    total_content_value_cents: int
+    total_delivery_cost_cents: int
+
+
+class ParcelStatsOut(BaseModel):
+    count: int
+    total_weight: float
+    total_content_value_cents: int
+    total_delivery_cost_cents: int
+    groups: list[ParcelStatsGroupOut]
+
+
 class ParcelOut(BaseModel):
     id: str
     name: str
@@ -27,6 +65,34 @@ class ParcelOut(BaseModel):
     session_id: str | None
     parcel_type: str
 
+    # Columns to select with `Parcel.filter(...).values(*ParcelOut.VALUES_FIELDS)`
+    VALUES_FIELDS: ClassVar[tuple[str, ...]] = (
+        "id",
+        "name",
+        "weight",
+        "content_value_cents",
+        "delivery_cost_cents",
+        "session_id",
+        "parcel_type__name",
+    )
+
+    @classmethod
+    def from_row(cls, row: dict[str, Any]) -> "ParcelOut":
+        """
+        Build from a `.values(*VALUES_FIELDS)` row in one step.
+
+        Rows come straight from the database, so validation is skipped.
+        """
+        return cls.model_construct(
+            id=str(row["id"]),
+            name=row["name"],
+            weight=row["weight"],
+            content_value_cents=row["content_value_cents"],
+            delivery_cost_cents=row["delivery_cost_cents"],
+            session_id=row["session_id"],
+            parcel_type=row["parcel_type__name"],
+        )
+
     @classmethod
     async def from_orm(cls, obj):
         parcel_type_data = await ParcelType_Pydantic.from_tortoise_orm(obj.parcel_type)
@@ -36,3 +102,7 @@ class ParcelOut(BaseModel):
             id=str(obj.id),
             parcel_type=parcel_type_data.name
         )
+
+
+ParcelInList = TypeAdapter(list[ParcelIn])
+ParcelOutList = TypeAdapter(list[ParcelOut])
@@ -34,11 +34,52 @@ class Parcel(models.Model):
 
     class Meta:
         table = "parcel"
+        # Filter combinations of GET /parcels/my, InnoDB appends the primary
+        # key to each of them so keyset pagination by id stays index-only.
+        # The first one names it, for engines that don't append it.
+        indexes = (
+            ("session_id", "id"),
+            ("session_id", "parcel_type_id"),
+            ("session_id", "delivery_cost_cents"),
+        )
 
     def __str__(self):
         return self.name
 
 
+class ParcelStats(models.Model):
+    id = fields.IntField(pk=True)
+    session_id = fields.CharField(
+        max_length=255, default="", description="Session of the parcels, empty if none"
+    )
+    parcel_type = fields.ForeignKeyField(
+        "models.ParcelType", related_name="stats", description="Type of the parcels"
+    )
+    priced = fields.BooleanField(description="Whether the parcels have a delivery cost")
+    count = fields.BigIntField(default=0)
+    total_weight = fields.FloatField(default=0)
+    total_content_value_cents = fields.BigIntField(default=0)
+    total_delivery_cost_cents = fields.BigIntField(default=0)
+
+    class Meta:
+        table = "parcel_stats"
+        unique_together = (("session_id", "parcel_type", "priced"),)
+
+
+class OutboxMessage(models.Model):
+    id = fields.BigIntField(pk=True)
+    body = fields.BinaryField(description="Encoded parcel_queue message")
+    content_type = fields.CharField(
+        max_length=64, description="AMQP content type of the body"
+    )
+    created_at = fields.DatetimeField(
+        auto_now_add=True, description="When the API accepted the parcels"
+    )
+
+    class Meta:
+        table = "parcel_outbox"
+
+
 # Creating Pydantic models for Tortoise ORM models
 ParcelType_Pydantic = pydantic_model_creator(ParcelType, name="ParcelType")
 ParcelTypeIn_Pydantic = pydantic_model_creator(
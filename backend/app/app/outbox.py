@@ -0,0 +1,176 @@
+"""
+Transactional outbox between the API and parcel_queue.
+
+With ``OUTBOX_ENABLED`` the API doesn't publish accepted parcels itself: it
+appends the encoded message to the ``parcel_outbox`` table and answers right
+away, so intake keeps working while RabbitMQ is down. A relay task in every
+API process moves the oldest rows to parcel_queue in batches, deleting them
+once the broker has confirmed them. Rows are locked with ``SKIP LOCKED`` so
+several relays share the backlog; a relay that dies between the confirm and
+the delete sends its batch again, which the consumer tolerates because the
+parcel IDs are assigned by the API.
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, Optional
+
+from loguru import logger
+from tortoise import timezone
+from tortoise.transactions import in_transaction
+
+from app.config import get_settings
+from app.db import WRITE_CONNECTION, read_from_primary
+from app.metrics import Counter, Gauge, Histogram
+from app.models.tortoise import OutboxMessage
+from app.wire import PARCEL_BATCH_KEY, encode
+
+if TYPE_CHECKING:
+    from app.producer import Publisher
+
+
+OUTBOX_BACKLOG = Gauge(
+    "parcel_outbox_backlog", "Messages in the outbox waiting to be relayed"
+)
+OUTBOX_LAG = Gauge(
+    "parcel_outbox_lag_seconds", "Age of the oldest message in the outbox"
+)
+OUTBOX_RELAYED = Counter(
+    "parcel_outbox_relayed", "Outbox messages published to parcel_queue"
+)
+OUTBOX_RELAY_FAILURES = Counter(
+    "parcel_outbox_relay_failures", "Relay batches that failed and will be retried"
+)
+OUTBOX_RELAY_DELAY = Histogram(
+    "parcel_outbox_relay_delay_seconds",
+    "Time from appending a message to the outbox to its broker confirmation",
+)
+
+
+class Outbox:
+    """
+    Durable buffer of parcel_queue messages and the relay that drains it.
+
+    The relay polls every ``poll_interval`` seconds, or right away after an
+    append in the same process, and relays up to ``batch_size`` messages at
+    a time. When the broker or the database fails it retries the batch after
+    ``retry_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        batch_size: int = 500,
+        poll_interval: float = 0.5,
+        retry_interval: float = 2.0,
+    ):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+
+        self._appended = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def append(self, data: dict, content_type: str) -> None:
+        """Store a parcel, or a batch envelope of parcels, for the relay."""
+        parcels = data[PARCEL_BATCH_KEY] if PARCEL_BATCH_KEY in data else [data]
+        await OutboxMessage.create(
+            body=encode(parcels, content_type), content_type=content_type
+        )
+        self._appended.set()
+
+    async def relay_batch(self, publisher: "Publisher") -> int:
+        """Publish the oldest messages and delete them once confirmed."""
+        async with in_transaction(WRITE_CONNECTION) as connection:
+            rows = (
+                await OutboxMessage.all()
+                .using_db(connection)
+                .select_for_update(skip_locked=True)
+                .order_by("id")
+                .limit(self.batch_size)
+            )
+            if not rows:
+                return 0
+            await asyncio.gather(
+                *(publisher.publish_body(row.body, row.content_type) for row in rows)
+            )
+            await (
+                OutboxMessage.filter(id__in=[row.id for row in rows])
+                .using_db(connection)
+                .delete()
+            )
+
+        now = timezone.now()
+        for row in rows:
+            OUTBOX_RELAY_DELAY.observe((now - row.created_at).total_seconds())
+        OUTBOX_RELAYED.inc(len(rows))
+        return len(rows)
+
+    async def update_stats(self) -> None:
+        with read_from_primary():
+            OUTBOX_BACKLOG.set(await OutboxMessage.all().count())
+            oldest = (
+                await OutboxMessage.all()
+                .order_by("id")
+                .first()
+                .values_list("created_at", flat=True)
+            )
+        OUTBOX_LAG.set(
+            0.0 if oldest is None else (timezone.now() - oldest).total_seconds()
+        )
+
+    async def _run(self, publisher: "Publisher") -> None:
+        while True:
+            try:
+                if not publisher.is_started:
+                    await publisher.start()
+                relayed = await self.relay_batch(publisher)
+                await self.update_stats()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                OUTBOX_RELAY_FAILURES.inc()
+                logger.error(f"Outbox relay failed, retrying: {e}")
+                await asyncio.sleep(self.retry_interval)
+                continue
+
+            if relayed < self.batch_size:
+                self._appended.clear()
+                try:
+                    await asyncio.wait_for(self._appended.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self, publisher: "Publisher") -> None:
+        """
+        Start relaying with ``publisher``, which is connected by the relay so
+        that startup doesn't wait for the broker.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(publisher))
+            logger.info("Outbox relay started.")
+
+    async def stop(self) -> None:
+        """Stop relaying; messages not yet relayed stay in the outbox."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Outbox relay stopped.")
+
+
+def create_outbox() -> Outbox:
+    settings = get_settings()
+    return Outbox(
+        settings.outbox_enabled,
+        batch_size=settings.outbox_batch_size,
+        poll_interval=settings.outbox_poll_interval,
+        retry_interval=settings.outbox_retry_interval,
+    )
+
+
+outbox = create_outbox()
@@ -0,0 +1,128 @@
+import asyncio
+import secrets
+from typing import Optional, Protocol
+
+import httpx
+from loguru import logger
+from redis.asyncio import Redis
+
+CBR_API_URL: str = "https://www.cbr-xml-daily.ru/daily_json.js"
+
+# Redis layout: the rate itself outlives its freshness marker, so an expired
+# marker means "serve the stale rate and refresh it in the background".
+USD_RATE_KEY: str = "usd_rate"
+USD_RATE_FRESH_KEY: str = "usd_rate:fresh"
+USD_RATE_LOCK_KEY: str = "usd_rate:lock"
+USD_RATE_FRESH_TTL: int = 86400
+USD_RATE_STALE_TTL: int = 7 * 86400
+
+# Deletes the lock only if it still holds our token: once the TTL has run
+# out another process may have taken it, and that lock isn't ours to drop.
+RELEASE_LOCK_SCRIPT: str = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RateProvider(Protocol):
+    async def fetch_usd_rate(self) -> float: ...
+
+
+class CbrRateProvider:
+    """Fetch the USD rate from the CBR daily JSON feed."""
+
+    def __init__(self, url: str = CBR_API_URL, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    async def fetch_usd_rate(self) -> float:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            return float(response.json()["Valute"]["USD"]["Value"])
+
+
+class SharedUsdRate:
+    """
+    USD rate shared by all processes through Redis.
+
+    A stale rate is returned immediately while one background task refreshes
+    it. A `SET NX` lock makes sure a single process in the fleet talks to the
+    provider at a time; the lock TTL must exceed the provider timeout. Each
+    acquisition stores a random token, and only the holder of that token
+    releases the lock.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        provider: RateProvider,
+        lock_ttl: int = 30,
+        wait_timeout: float = 10.0,
+        poll_interval: float = 0.2,
+    ):
+        self.redis = redis
+        self.provider = provider
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _read(self) -> tuple[Optional[float], bool]:
+        rate, fresh = await self.redis.mget(USD_RATE_KEY, USD_RATE_FRESH_KEY)
+        return (float(rate) if rate else None), fresh is not None
+
+    async def store(self, rate: float) -> None:
+        await self.redis.set(USD_RATE_KEY, str(rate), ex=USD_RATE_STALE_TTL)
+        await self.redis.set(USD_RATE_FRESH_KEY, "1", ex=USD_RATE_FRESH_TTL)
+
+    async def refresh(self) -> Optional[float]:
+        """
+        Fetch and store a new rate if this process wins the refresh lock.
+
+        Returns the new rate, or None if another process holds the lock or
+        the provider failed.
+        """
+        token = secrets.token_hex(16)
+        if not await self.redis.set(
+            USD_RATE_LOCK_KEY, token, nx=True, ex=self.lock_ttl
+        ):
+            return None
+        try:
+            rate = await self.provider.fetch_usd_rate()
+            await self.store(rate)
+            logger.info(f"USD rate refreshed: {rate}")
+            return rate
+        except Exception as e:
+            logger.error(f"Error refreshing USD rate: {e}")
+            return None
+        finally:
+            await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, USD_RATE_LOCK_KEY, token)
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def get_rate(self) -> float:
+        """Return the shared rate, fetching it only when Redis has none at all."""
+        rate, fresh = await self._read()
+        if rate is not None:
+            if not fresh:
+                self._refresh_in_background()
+            return rate
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        while True:
+            rate = await self.refresh()
+            if rate is not None:
+                return rate
+            if loop.time() >= deadline:
+                raise RuntimeError("USD rate is unavailable")
+            # Another process holds the lock, wait for it to store the rate
+            await asyncio.sleep(self.poll_interval)
+            rate, _ = await self._read()
+            if rate is not None:
+                return rate
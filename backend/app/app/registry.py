@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from app.db import read_from_primary
+from app.models.tortoise import ParcelType
+from app.utils import ASYNC_REDIS_CLIENT, pubsub_messages
+
+
+PARCEL_TYPES_CHANNEL = "parcel_types:invalidate"
+
+
+class ParcelTypeRegistry:
+    """
+    Process-local name <-> id map of parcel types.
+
+    The table is tiny and rarely changes, so it is loaded once and served
+    from memory. Processes that add a type publish on `PARCEL_TYPES_CHANNEL`
+    and every registry subscribed to it reloads. An unknown name or id also
+    triggers a reload, which covers types added while the listener was down;
+    at most one every ``miss_reload_interval`` seconds, so that requests
+    naming types that don't exist can't load the database.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        reconnect_delay: float = 1.0,
+        miss_reload_interval: float = 5.0,
+    ):
+        self.redis = redis
+        self.reconnect_delay = reconnect_delay
+        self.miss_reload_interval = miss_reload_interval
+        self.etag: Optional[str] = None
+        self._by_name: dict[str, int] = {}
+        self._by_id: dict[int, str] = {}
+        self._loaded = False
+        self._miss_reloaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def load(self) -> None:
+        """Reload every parcel type from the database."""
+        async with self._lock:
+            # From the primary, so that a reload after an invalidation sees
+            # the new type even before it reaches the replica
+            with read_from_primary():
+                rows = await ParcelType.all().order_by("id").values("id", "name")
+            self._by_name = {row["name"]: row["id"] for row in rows}
+            self._by_id = {row["id"]: row["name"] for row in rows}
+            self.etag = hashlib.sha1(json.dumps(rows).encode()).hexdigest()
+            self._loaded = True
+        logger.info(f"Loaded {len(rows)} parcel types.")
+
+    async def ensure_loaded(self) -> None:
+        if not self._loaded:
+            await self.load()
+
+    def invalidate(self) -> None:
+        self._loaded = False
+
+    async def _reload_on_miss(self) -> None:
+        now = time.monotonic()
+        if (
+            self._miss_reloaded_at is not None
+            and now - self._miss_reloaded_at < self.miss_reload_interval
+        ):
+            return
+        # Taken before the load, so concurrent misses don't queue up reloads
+        self._miss_reloaded_at = now
+        await self.load()
+
+    async def get_id(self, name: str) -> Optional[int]:
+        """Return the id of the parcel type called ``name``, or None."""
+        await self.ensure_loaded()
+        if name not in self._by_name:
+            await self._reload_on_miss()
+        return self._by_name.get(name)
+
+    async def get_name(self, parcel_type_id: int) -> Optional[str]:
+        await self.ensure_loaded()
+        if parcel_type_id not in self._by_id:
+            await self._reload_on_miss()
+        return self._by_id.get(parcel_type_id)
+
+    async def all(self) -> list[dict]:
+        await self.ensure_loaded()
+        return [{"id": id_, "name": name} for id_, name in self._by_id.items()]
+
+    async def publish_invalidation(self) -> None:
+        """Reload locally and tell the other processes to reload."""
+        await self.load()
+        try:
+            await self.redis.publish(PARCEL_TYPES_CHANNEL, "reload")
+        except Exception as e:
+            logger.error(f"Error publishing parcel types invalidation: {e}")
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(PARCEL_TYPES_CHANNEL)
+                    # Invalidations may have been missed while disconnected
+                    self.invalidate()
+                    async for message in pubsub_messages(pubsub):
+                        if message["type"] == "message":
+                            self.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Parcel types listener disconnected: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+
+    def start(self) -> None:
+        """Start listening for invalidations published by other processes."""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+parcel_type_registry = ParcelTypeRegistry(ASYNC_REDIS_CLIENT)
@@ -0,0 +1,285 @@
+"""
+Recompute the delivery cost of saved parcels.
+
+    python -m app.reprice                           # parcels without a cost
+    python -m app.reprice --all --rate 92.5         # every parcel, corrected rate
+    python -m app.reprice --all --shard 0 --shards 4
+
+Parcels are scanned in primary key order, ``--chunk-size`` at a time, and all
+of them are priced at one USD rate: ``--rate``, or the current rate when the
+job starts. Each chunk is written back with a single ``UPDATE ... CASE`` in
+its own transaction, up to ``--concurrency`` chunks at once; keep it below
+the size of the database connection pool.
+
+After every chunk written the position is saved to ``--checkpoint`` along
+with the rate, so an interrupted job resumes where it stopped at the same
+rate; ``--restart`` discards the checkpoint. ``--shards N`` splits the UUID
+key space into N equal ranges, so N processes can run side by side, one per
+``--shard``, each with its own checkpoint.
+
+Repriced parcels are dropped from the parcel cache, and the ``parcel_stats``
+summary is updated along with them when it is enabled.
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import time
+import uuid
+from collections import deque
+from typing import Optional
+
+from loguru import logger
+from tortoise import Tortoise
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
+
+from app.cache import parcel_cache
+from app.config import get_settings
+from app.db import TORTOISE_ORM, WRITE_CONNECTION
+from app.log import configure_logging
+from app.models.tortoise import Parcel
+from app.stats import add_to_summary
+from app.utils import calculate_delivery_costs, usd_rate_cache
+
+
+REPRICE_FIELDS = (
+    "id",
+    "weight",
+    "content_value_cents",
+    "delivery_cost_cents",
+    "session_id",
+    "parcel_type_id",
+)
+
+
+def shard_range(shard: int, shards: int) -> tuple[Optional[str], Optional[str]]:
+    """Bounds ``[low, high)`` of a shard of the UUID key space; None is open."""
+
+    def bound(k: int) -> Optional[str]:
+        if k in (0, shards):
+            return None
+        return str(uuid.UUID(int=k * 2**128 // shards))
+
+    return bound(shard), bound(shard + 1)
+
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path: str, state: dict) -> None:
+    # Replaced in one step, so a crash never leaves half a checkpoint
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+class Repricer:
+    """
+    Reprices the parcels of one shard, resuming from ``state``.
+
+    ``state`` holds the rate and the progress and is saved to
+    ``checkpoint_path``, when given, each time the chunks up to a new
+    position have all been written.
+    """
+
+    def __init__(
+        self,
+        state: dict,
+        chunk_size: int = 1_000,
+        concurrency: int = 4,
+        checkpoint_path: Optional[str] = None,
+        report_interval: float = 10.0,
+    ):
+        self.state = state
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.checkpoint_path = checkpoint_path
+        self.report_interval = report_interval
+        self._low, self._high = shard_range(state["shard"], state["shards"])
+
+    def query(self, last_id: Optional[str]) -> QuerySet[Parcel]:
+        """Parcels of the shard to reprice after ``last_id``."""
+        query = Parcel.all()
+        if self.state["only_missing"]:
+            query = query.filter(delivery_cost_cents__isnull=True)
+        if self._high is not None:
+            query = query.filter(id__lt=self._high)
+        if last_id is not None:
+            return query.filter(id__gt=last_id)
+        if self._low is not None:
+            return query.filter(id__gte=self._low)
+        return query
+
+    async def reprice_chunk(self, parcels: list[Parcel]) -> int:
+        """Write the new costs of the parcels whose cost changes."""
+        costs = calculate_delivery_costs(
+            [parcel.weight for parcel in parcels],
+            [parcel.content_value_cents for parcel in parcels],
+            self.state["rate"],
+        )
+        previous, changed = [], []
+        for parcel, cost in zip(parcels, costs.tolist()):
+            if parcel.delivery_cost_cents != cost:
+                previous.append(copy.copy(parcel))
+                parcel.delivery_cost_cents = cost
+                changed.append(parcel)
+        if not changed:
+            return 0
+
+        async with in_transaction(WRITE_CONNECTION):
+            await Parcel.bulk_update(
+                changed, fields=["delivery_cost_cents"], batch_size=len(changed)
+            )
+            if get_settings().parcel_stats_summary:
+                await add_to_summary(previous, sign=-1)
+                await add_to_summary(changed)
+        await parcel_cache.invalidate([str(parcel.id) for parcel in changed])
+        return len(changed)
+
+    def _advance(self, chunks: deque) -> None:
+        """Checkpoint past the chunks at the head of ``chunks`` that are written."""
+        advanced = False
+        while chunks and chunks[0][2].done():
+            last_id, scanned, task = chunks.popleft()
+            self.state["repriced"] += task.result()
+            self.state["scanned"] += scanned
+            self.state["last_id"] = last_id
+            advanced = True
+        if advanced and self.checkpoint_path is not None:
+            save_checkpoint(self.checkpoint_path, self.state)
+
+    async def run(self) -> dict:
+        """Reprice every chunk after the checkpoint and return the final state."""
+        slots = asyncio.Semaphore(self.concurrency)
+        # (last id, size, write task) of each chunk, in key order
+        chunks: deque[tuple[str, int, asyncio.Task]] = deque()
+        last_id = self.state["last_id"]
+        started = reported = time.perf_counter()
+        scanned_before = self.state["scanned"]
+
+        async def write(parcels: list[Parcel]) -> int:
+            try:
+                return await self.reprice_chunk(parcels)
+            finally:
+                slots.release()
+
+        try:
+            while True:
+                parcels = (
+                    await self.query(last_id)
+                    .order_by("id")
+                    .limit(self.chunk_size)
+                    .only(*REPRICE_FIELDS)
+                )
+                if not parcels:
+                    break
+                last_id = str(parcels[-1].id)
+
+                await slots.acquire()
+                chunks.append(
+                    (last_id, len(parcels), asyncio.create_task(write(parcels)))
+                )
+                self._advance(chunks)
+
+                now = time.perf_counter()
+                if now - reported >= self.report_interval:
+                    reported = now
+                    logger.info(
+                        f"Scanned {self.state['scanned']} parcels, repriced "
+                        f"{self.state['repriced']}, "
+                        f"{(self.state['scanned'] - scanned_before) / (now - started):.0f} rows/s"
+                    )
+                if len(parcels) < self.chunk_size:
+                    break
+
+            await asyncio.wait([task for _, _, task in chunks])
+            self._advance(chunks)
+        finally:
+            for _, _, task in chunks:
+                task.cancel()
+
+        self.state["done"] = True
+        if self.checkpoint_path is not None:
+            save_checkpoint(self.checkpoint_path, self.state)
+        return self.state
+
+
+async def main(args: argparse.Namespace) -> None:
+    checkpoint_path = args.checkpoint or f"reprice-{args.shard}-of-{args.shards}.json"
+    state = None if args.restart else load_checkpoint(checkpoint_path)
+    if state is not None:
+        if (state["shard"], state["shards"], state["only_missing"]) != (
+            args.shard,
+            args.shards,
+            not args.all,
+        ):
+            raise SystemExit(
+                f"{checkpoint_path} belongs to another job, pass --restart to discard it"
+            )
+        if state["done"]:
+            print(f"Already done: {state['repriced']} parcels repriced")
+            return
+
+    await Tortoise.init(config=TORTOISE_ORM)
+    try:
+        if state is None:
+            state = {
+                "rate": args.rate or await usd_rate_cache.get(),
+                "only_missing": not args.all,
+                "shard": args.shard,
+                "shards": args.shards,
+                "last_id": None,
+                "scanned": 0,
+                "repriced": 0,
+                "done": False,
+            }
+            save_checkpoint(checkpoint_path, state)
+        elif args.rate and args.rate != state["rate"]:
+            raise SystemExit(
+                f"{checkpoint_path} was started at rate {state['rate']}, "
+                "pass --restart to reprice at another rate"
+            )
+        logger.info(f"Repricing at USD rate {state['rate']} from {state['last_id']}")
+
+        started = time.perf_counter()
+        scanned_before = state["scanned"]
+        repricer = Repricer(
+            state,
+            chunk_size=args.chunk_size,
+            concurrency=args.concurrency,
+            checkpoint_path=checkpoint_path,
+        )
+        state = await repricer.run()
+        elapsed = time.perf_counter() - started
+        print(
+            f"Repriced {state['repriced']} of {state['scanned']} parcels scanned, "
+            f"{(state['scanned'] - scanned_before) / elapsed:.0f} rows/s"
+        )
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--all", action="store_true", help="Reprice parcels that already have a cost"
+    )
+    parser.add_argument("--rate", type=float, default=None, help="USD rate to use")
+    parser.add_argument("--chunk-size", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--shard", type=int, default=0)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--restart", action="store_true")
+    configure_logging()
+    asyncio.run(main(parser.parse_args()))
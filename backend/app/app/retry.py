@@ -0,0 +1,106 @@
+from typing import Optional, Sequence
+
+from aio_pika import DeliveryMode, IncomingMessage, Message
+from aio_pika.abc import AbstractChannel, AbstractExchange
+from loguru import logger
+from pydantic import ValidationError
+
+from app.config import get_settings
+from app.metrics import PARCELS_DEAD_LETTERED, PARCELS_RETRIED
+from app.producer import ATTEMPTS_HEADER, QUEUE_NAME, retry_queue_name
+
+
+class PermanentError(Exception):
+    """Processing the message again can't succeed, e.g. it names an unknown type."""
+
+
+# Errors raised by malformed payloads; anything else is assumed to be transient
+PERMANENT_ERRORS = (PermanentError, ValidationError, ValueError, KeyError, TypeError)
+
+
+def attempts(message: IncomingMessage) -> int:
+    """Number of earlier attempts to process ``message`` that failed."""
+    value = (message.headers or {}).get(ATTEMPTS_HEADER, 0)
+    return value if isinstance(value, int) else 0
+
+
+def retry_headers(message: IncomingMessage, attempt: int) -> dict:
+    headers = {
+        key: value
+        for key, value in (message.headers or {}).items()
+        # x-death grows with every dead-lettering, the broker adds it back
+        if key not in ("x-death", ATTEMPTS_HEADER)
+    }
+    if attempt:
+        headers[ATTEMPTS_HEADER] = attempt
+    return headers
+
+
+class RetryPolicy:
+    """
+    Decides the fate of a message that failed to process.
+
+    Transient failures are retried after ``delays_ms[n]`` milliseconds for
+    the n-th attempt, via the retry queues declared by `declare_parcel_queue`.
+    Permanent failures, and messages that failed ``max_attempts`` times, are
+    rejected into the dead-letter queue. Until `bind` gives the policy a
+    channel to publish retries on, every failure is dead-lettered.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        delays_ms: Sequence[int] = (1_000, 5_000, 30_000, 120_000),
+        queue_name: str = QUEUE_NAME,
+    ):
+        self.max_attempts = max_attempts
+        self.delays_ms = tuple(delays_ms)
+        self.queue_name = queue_name
+        self.exchange: Optional[AbstractExchange] = None
+
+    def bind(self, channel: AbstractChannel) -> None:
+        self.exchange = channel.default_exchange
+
+    def delay_ms(self, attempt: int) -> int:
+        return self.delays_ms[min(attempt, len(self.delays_ms)) - 1]
+
+    async def handle_failure(self, message: IncomingMessage, error: Exception) -> None:
+        failed = attempts(message) + 1
+        if (
+            isinstance(error, PERMANENT_ERRORS)
+            or failed >= self.max_attempts
+            or self.exchange is None
+            or not self.delays_ms
+        ):
+            logger.error(
+                f"Dead-lettering message after {failed} attempt(s): "
+                f"{type(error).__name__}: {error}"
+            )
+            await message.reject(requeue=False)
+            PARCELS_DEAD_LETTERED.inc()
+            return
+
+        delay_ms = self.delay_ms(failed)
+        await self.exchange.publish(
+            Message(
+                body=message.body,
+                headers=retry_headers(message, failed),
+                content_type=message.content_type,
+                delivery_mode=DeliveryMode.PERSISTENT,
+                expiration=delay_ms / 1000,
+            ),
+            routing_key=retry_queue_name(delay_ms, self.queue_name),
+        )
+        await message.ack()
+        PARCELS_RETRIED.inc()
+        logger.warning(f"Retrying message in {delay_ms} ms, attempt {failed}: {error}")
+
+
+def create_retry_policy() -> RetryPolicy:
+    settings = get_settings()
+    return RetryPolicy(
+        settings.consumer_max_attempts, settings.consumer_retry_delays_ms
+    )
+
+
+retry_policy = create_retry_policy()
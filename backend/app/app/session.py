@@ -0,0 +1,127 @@
+import math
+import time
+from http.cookies import SimpleCookie
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db import read_from_primary
+from app.utils import SessionManager
+
+
+SESSION_COOKIE = "session_id"
+# End of the session's read-your-writes window, as a Unix timestamp
+READ_PRIMARY_COOKIE = "read_primary"
+# Endpoints that never look at the session
+SESSION_EXCLUDED_PATHS = ("/healthcheck", "/metrics")
+
+
+class SessionIdMiddleware:
+    """
+    Pure ASGI middleware attaching a signed session ID to every request.
+
+    The ID from the `session_id` cookie is verified once per process (see
+    `SessionManager`); a missing or invalid one is replaced by a new ID that
+    is sent back in `Set-Cookie`. Either way handlers find it in
+    `request.state.session_id`.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        session_manager: SessionManager,
+        exclude_paths: tuple[str, ...] = SESSION_EXCLUDED_PATHS,
+    ):
+        self.app = app
+        self.session_manager = session_manager
+        self.exclude_paths = frozenset(exclude_paths)
+
+    def _cookie_session_id(self, scope: Scope) -> str | None:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                return cookie_parser(value.decode("latin-1")).get(SESSION_COOKIE)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        session_id = self._cookie_session_id(scope)
+        if session_id and self.session_manager.validate_session_id(session_id):
+            scope.setdefault("state", {})["session_id"] = session_id
+            await self.app(scope, receive, send)
+            return
+
+        session_id = self.session_manager.create_session_id()
+        scope.setdefault("state", {})["session_id"] = session_id
+        cookie = SimpleCookie()
+        cookie[SESSION_COOKIE] = session_id
+        cookie[SESSION_COOKIE]["path"] = "/"
+        cookie[SESSION_COOKIE]["httponly"] = True
+        cookie[SESSION_COOKIE]["samesite"] = "lax"
+        set_cookie = cookie.output(header="").strip()
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("set-cookie", set_cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pure ASGI middleware routing a session's reads to the primary for
+    ``window`` seconds after it changed something.
+
+    A successful request other than GET or HEAD sets the `read_primary`
+    cookie to the end of the window; requests carrying an unexpired one read
+    in `read_from_primary()`, so a parcel the session just submitted doesn't
+    look missing while the replica lags behind.
+    """
+
+    def __init__(self, app: ASGIApp, window: float):
+        self.app = app
+        self.window = window
+
+    def _reads_primary(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                until = cookie_parser(value.decode("latin-1")).get(READ_PRIMARY_COOKIE)
+                try:
+                    return until is not None and float(until) > time.time()
+                except ValueError:
+                    return False
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writes = scope["method"] not in ("GET", "HEAD")
+
+        async def send_marked(message: Message) -> None:
+            if (
+                writes
+                and message["type"] == "http.response.start"
+                and message["status"] < 400
+            ):
+                cookie = SimpleCookie()
+                cookie[READ_PRIMARY_COOKIE] = str(time.time() + self.window)
+                cookie[READ_PRIMARY_COOKIE]["path"] = "/"
+                cookie[READ_PRIMARY_COOKIE]["max-age"] = math.ceil(self.window)
+                cookie[READ_PRIMARY_COOKIE]["httponly"] = True
+                cookie[READ_PRIMARY_COOKIE]["samesite"] = "lax"
+                MutableHeaders(scope=message).append(
+                    "set-cookie", cookie.output(header="").strip()
+                )
+            await send(message)
+
+        if self._reads_primary(scope):
+            with read_from_primary():
+                await self.app(scope, receive, send_marked)
+        else:
+            await self.app(scope, receive, send_marked)
@@ -0,0 +1,162 @@
+"""
+Parcel statistics per session, parcel type and priced/unpriced status.
+
+Statistics are aggregated with ``GROUP BY`` over the ``parcel`` table, or,
+with ``PARCEL_STATS_SUMMARY``, read from the ``parcel_stats`` summary table
+that the consumer updates in the transaction saving the parcels. Rebuild the
+summary before turning it on, and after changing parcels outside the
+consumer and `app.reprice`:
+
+    python -m app.stats rebuild
+"""
+
+import argparse
+import asyncio
+from collections import defaultdict
+from typing import Iterable
+
+from tortoise import Tortoise
+from tortoise.expressions import F
+from tortoise.functions import Count, Sum
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
+
+from app.config import get_settings
+from app.db import TORTOISE_ORM, WRITE_CONNECTION
+from app.log import configure_logging
+from app.models.tortoise import Parcel, ParcelStats
+
+
+STATS_FIELDS = (
+    "count",
+    "total_weight",
+    "total_content_value_cents",
+    "total_delivery_cost_cents",
+)
+
+
+async def aggregate_parcels(
+    query: QuerySet[Parcel], group_by: tuple[str, ...] = ("parcel_type_id",)
+) -> list[dict]:
+    """Sum the parcels of ``query`` per ``group_by`` columns and priced status."""
+    rows = []
+    for priced in (True, False):
+        grouped = (
+            await query.filter(delivery_cost_cents__isnull=not priced)
+            .annotate(
+                count=Count("id"),
+                total_weight=Sum("weight"),
+                total_content_value_cents=Sum("content_value_cents"),
+                total_delivery_cost_cents=Sum("delivery_cost_cents"),
+            )
+            .group_by(*group_by)
+            .values(*group_by, *STATS_FIELDS)
+        )
+        for row in grouped:
+            # MySQL sums integers as DECIMAL and unpriced costs as NULL
+            rows.append(
+                row
+                | {
+                    "priced": priced,
+                    "total_weight": float(row["total_weight"] or 0),
+                    "total_content_value_cents": int(
+                        row["total_content_value_cents"] or 0
+                    ),
+                    "total_delivery_cost_cents": int(
+                        row["total_delivery_cost_cents"] or 0
+                    ),
+                }
+            )
+    return rows
+
+
+async def session_stats(session_id: str | None) -> list[dict]:
+    """Statistics of a session's parcels per ``parcel_type_id`` and ``priced``."""
+    if get_settings().parcel_stats_summary:
+        rows = await ParcelStats.filter(
+            session_id=session_id or "", count__gt=0
+        ).values("parcel_type_id", "priced", *STATS_FIELDS)
+    else:
+        rows = await aggregate_parcels(Parcel.filter(session_id=session_id))
+    return sorted(rows, key=lambda row: (row["parcel_type_id"], not row["priced"]))
+
+
+async def add_to_summary(parcels: Iterable[Parcel], sign: int = 1) -> None:
+    """
+    Add newly saved parcels to the summary table, or subtract them with a
+    ``sign`` of -1; call it in the transaction that changes them.
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0, 0])
+    for parcel in parcels:
+        key = (
+            parcel.session_id or "",
+            parcel.parcel_type_id,
+            parcel.delivery_cost_cents is not None,
+        )
+        delta = deltas[key]
+        delta[0] += sign
+        delta[1] += sign * parcel.weight
+        delta[2] += sign * parcel.content_value_cents
+        delta[3] += sign * (parcel.delivery_cost_cents or 0)
+
+    # A fixed order keeps concurrent consumers from deadlocking on the rows.
+    # Two consumers creating the same row make one transaction fail on the
+    # unique key, and its message is retried.
+    for (session_id, parcel_type_id, priced), delta in sorted(deltas.items()):
+        count, weight, content_value_cents, delivery_cost_cents = delta
+        updated = await ParcelStats.filter(
+            session_id=session_id, parcel_type_id=parcel_type_id, priced=priced
+        ).update(
+            count=F("count") + count,
+            total_weight=F("total_weight") + weight,
+            total_content_value_cents=F("total_content_value_cents")
+            + content_value_cents,
+            total_delivery_cost_cents=F("total_delivery_cost_cents")
+            + delivery_cost_cents,
+        )
+        if not updated:
+            await ParcelStats.create(
+                session_id=session_id,
+                parcel_type_id=parcel_type_id,
+                priced=priced,
+                count=count,
+                total_weight=weight,
+                total_content_value_cents=content_value_cents,
+                total_delivery_cost_cents=delivery_cost_cents,
+            )
+
+
+async def rebuild_summary() -> int:
+    """Recompute the summary table from the parcels, returning its row count."""
+    async with in_transaction(WRITE_CONNECTION):
+        rows = await aggregate_parcels(
+            Parcel.all(), group_by=("session_id", "parcel_type_id")
+        )
+        await ParcelStats.all().delete()
+        await ParcelStats.bulk_create(
+            [
+                ParcelStats(**row | {"session_id": row["session_id"] or ""})
+                for row in rows
+            ],
+            batch_size=1_000,
+        )
+    return len(rows)
+
+
+async def main(args: argparse.Namespace) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    try:
+        rows = await rebuild_summary()
+        print(f"Rebuilt parcel_stats with {rows} rows")
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild", help="Recompute parcel_stats from the parcels")
+    configure_logging()
+    asyncio.run(main(parser.parse_args()))
@@ -1,49 +1,135 @@
-from typing import Optional, Dict, Any
+import asyncio
+import base64
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Dict, Any, AsyncIterator, Sequence
 
+import numpy as np
 import redis
+import redis.asyncio
+from redis.asyncio.client import PubSub
 import requests
-from itsdangerous import URLSafeTimedSerializer
+from itsdangerous import BadData, URLSafeTimedSerializer
 
+from app.metrics import Gauge
+from app.rates import (
+    CBR_API_URL,
+    USD_RATE_FRESH_KEY,
+    USD_RATE_FRESH_TTL,
+    USD_RATE_KEY,
+    USD_RATE_STALE_TTL,
+    CbrRateProvider,
+    SharedUsdRate,
+)
 
-# Constants for Redis configuration and CBR API URL
+
+# Constants for Redis configuration and the CBR API
 REDIS_HOST: str = "redis"
 REDIS_PORT: int = 6379
 REDIS_DB: int = 0
-CBR_API_URL: str = "https://www.cbr-xml-daily.ru/daily_json.js"
+# Bound every Redis call, so an unreachable Redis can't stall the callers
+REDIS_SOCKET_TIMEOUT: float = 1.0
+REDIS_CONNECT_TIMEOUT: float = 1.0
+# How often pub/sub listeners wake up; `PubSub.listen` would hit the socket timeout
+PUBSUB_POLL_INTERVAL: float = 0.5
+CBR_API_TIMEOUT: float = 5.0
+# How long a process keeps its local copy of the USD rate before asking Redis again
+USD_RATE_LOCAL_TTL: float = 60.0
+
+# Initialize the Redis clients
+REDIS_CLIENT: redis.Redis = redis.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+)
+ASYNC_REDIS_CLIENT: redis.asyncio.Redis = redis.asyncio.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+)
+
 
-# Initialize the Redis client
-REDIS_CLIENT: redis.Redis = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
+async def pubsub_messages(pubsub: PubSub) -> AsyncIterator[dict]:
+    """Messages published to the channels of ``pubsub``, until it fails."""
+    while True:
+        message = await pubsub.get_message(
+            ignore_subscribe_messages=True, timeout=PUBSUB_POLL_INTERVAL
+        )
+        if message is not None:
+            yield message
 
 
 class SessionManager:
-    def __init__(self, secret_key: str):
+    """
+    Signs session IDs and verifies them.
+
+    Verified IDs are remembered in an LRU of `cache_size` entries, so a
+    returning client costs a dict lookup instead of an HMAC check.
+    """
+
+    def __init__(self, secret_key: str, cache_size: int = 10_000):
         self.serializer = URLSafeTimedSerializer(secret_key)
+        self.cache_size = cache_size
+        self._verified: OrderedDict[str, None] = OrderedDict()
+
+    def _remember(self, session_id: str) -> None:
+        self._verified[session_id] = None
+        if len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
 
     def create_session_id(self) -> str:
-        return self.serializer.dumps({})
+        # A random payload, so that sessions created within the same second
+        # get different IDs
+        session_id = self.serializer.dumps(uuid.uuid4().hex)
+        self._remember(session_id)
+        return session_id
 
     def validate_session_id(self, session_id: str) -> bool:
+        if session_id in self._verified:
+            self._verified.move_to_end(session_id)
+            return True
         try:
             self.serializer.loads(session_id)
-            return True
-        except:
+        except BadData:
             return False
+        self._remember(session_id)
+        return True
+
+
+def encode_cursor(last_id: Any) -> str:
+    """Build an opaque keyset pagination cursor pointing after ``last_id``."""
+    return base64.urlsafe_b64encode(json.dumps({"id": str(last_id)}).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """Return the id stored in a cursor made by `encode_cursor`."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
 
 
 def get_cached_usd_rate() -> Optional[float]:
     """Retrieve the cached USD exchange rate from Redis."""
-    rate = REDIS_CLIENT.get("usd_rate")
+    rate = REDIS_CLIENT.get(USD_RATE_KEY)
     return float(rate) if rate else None
 
 
 def cache_usd_rate(rate: float) -> None:
-    """Cache the USD exchange rate in Redis for 24 hours."""
-    REDIS_CLIENT.setex("usd_rate", 86400, str(rate))
+    """Cache the USD exchange rate in Redis, fresh for 24 hours."""
+    REDIS_CLIENT.setex(USD_RATE_KEY, USD_RATE_STALE_TTL, str(rate))
+    REDIS_CLIENT.setex(USD_RATE_FRESH_KEY, USD_RATE_FRESH_TTL, "1")
 
 
 def fetch_usd_rate_from_api() -> float:
     """Fetch the current USD exchange rate from the CBR API."""
-    response = requests.get(CBR_API_URL)
+    response = requests.get(CBR_API_URL, timeout=CBR_API_TIMEOUT)
     data: Dict[str, Any] = response.json()
     return data["Valute"]["USD"]["Value"]
 
@@ -58,12 +144,107 @@ def get_usd_exchange_rate() -> float:
     return usd_rate
 
 
-def calculate_delivery_cost(weight: float, content_value_cents: int) -> int:
+class RateCache:
+    """
+    Process-local cache for the USD rate in front of Redis.
+
+    A fresh local value is served without any I/O. On expiry a single
+    coroutine per process reloads it from `source` while the others wait
+    for that result. Every reload bumps `version`.
+    """
+
+    def __init__(self, source: SharedUsdRate, ttl: float = USD_RATE_LOCAL_TTL):
+        self.source = source
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._value: Optional[float] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._value is not None and time.monotonic() < self._expires_at
+
+    def set(self, rate: float) -> None:
+        self._value = rate
+        self._expires_at = time.monotonic() + self.ttl
+        self.version += 1
+
+    def invalidate(self) -> None:
+        self._value = None
+        self._expires_at = 0.0
+
+    def peek(self) -> Optional[float]:
+        """Return the local rate if it is still fresh, without loading it."""
+        if self._fresh():
+            self.hits += 1
+            return self._value
+        return None
+
+    async def get(self) -> float:
+        """Return the USD rate, refreshing it once per process on expiry."""
+        if self._fresh():
+            self.hits += 1
+            return self._value
+        async with self._lock:
+            if self._fresh():
+                self.hits += 1
+                return self._value
+            self.misses += 1
+            self.set(await self.source.get_rate())
+            return self._value
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self.version,
+            "fresh": self._fresh(),
+        }
+
+
+usd_rate_source = SharedUsdRate(
+    ASYNC_REDIS_CLIENT, CbrRateProvider(CBR_API_URL, timeout=CBR_API_TIMEOUT)
+)
+usd_rate_cache = RateCache(usd_rate_source)
+
+USD_RATE_CACHE_LOOKUPS = Gauge(
+    "usd_rate_cache_lookups", "Process-local USD rate lookups by result", ("result",)
+)
+for result in ("hits", "misses"):
+    USD_RATE_CACHE_LOOKUPS.labels(result).set_function(
+        lambda result=result: usd_rate_cache.stats()[result]
+    )
+
+
+def set_rate_provider(provider) -> None:
+    """Swap the USD rate provider, e.g. to point it at a stub server in tests."""
+    usd_rate_source.provider = provider
+    usd_rate_cache.invalidate()
+
+
+def get_local_usd_exchange_rate() -> float:
+    """Synchronous counterpart of `RateCache.get` for code outside the event loop."""
+    rate = usd_rate_cache.peek()
+    if rate is None:
+        usd_rate_cache.misses += 1
+        rate = get_usd_exchange_rate()
+        usd_rate_cache.set(rate)
+    return rate
+
+
+def calculate_delivery_cost(
+    weight: float, content_value_cents: int, usd_rate: Optional[float] = None
+) -> int:
     """
     Calculate the delivery cost based on weight, content value in cents, and USD exchange rate.
     Both the content value and the delivery cost are in cents.
+
+    Pass ``usd_rate`` to price several parcels against one rate lookup.
     """
-    usd_rate = get_usd_exchange_rate()
+    if usd_rate is None:
+        usd_rate = get_local_usd_exchange_rate()
 
     # Convert USD rate to a cents-based rate for consistency
     usd_rate_cents = usd_rate * 100
@@ -74,3 +255,32 @@ def calculate_delivery_cost(weight: float, content_value_cents: int) -> int:
     )
 
     return delivery_cost_cents
+
+
+def calculate_delivery_costs(
+    weights: Sequence[float] | np.ndarray,
+    content_values_cents: Sequence[int] | np.ndarray,
+    usd_rate: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Vectorized `calculate_delivery_cost` for many parcels at once.
+
+    The rate is resolved once for the whole batch. Returns an int64 array
+    whose values match the scalar function exactly, truncation included.
+    """
+    if usd_rate is None:
+        usd_rate = get_local_usd_exchange_rate()
+
+    weights = np.asarray(weights, dtype=np.float64)
+    content_values_cents = np.asarray(content_values_cents, dtype=np.float64)
+    if weights.shape != content_values_cents.shape:
+        raise ValueError("weights and content_values_cents must have the same shape")
+
+    usd_rate_cents = usd_rate * 100
+
+    # Same float64 operations in the same order as the scalar path, then
+    # truncation toward zero like int()
+    delivery_costs_cents = (
+        weights * 0.5 + content_values_cents * 0.01
+    ) * usd_rate_cents
+    return np.trunc(delivery_costs_cents).astype(np.int64)
@@ -0,0 +1,147 @@
+"""
+Encoding of parcel_queue messages.
+
+Every message holds a list of parcels. Its format is named by the AMQP
+``content_type`` property:
+
+* ``application/json`` (or no content type) - the original format, one
+  parcel dict or a `PARCEL_BATCH_KEY` envelope of them.
+* `PARCELS_V1_CONTENT_TYPE` - a fixed binary layout carrying only the fields
+  the consumer stores; the name of the parcel type and the empty delivery
+  cost are dropped.
+
+Consumers decode every format, so they must be upgraded before producers
+switch to a new one.
+"""
+
+import json
+import struct
+import uuid
+from typing import Callable
+
+
+# Messages holding this key carry a list of parcels instead of a single one
+PARCEL_BATCH_KEY = "parcels"
+
+JSON_CONTENT_TYPE = "application/json"
+PARCELS_V1_CONTENT_TYPE = "application/vnd.parcels.v1"
+
+# v1: magic, version, parcel count; then per parcel the fixed fields below
+# followed by the UTF-8 name and session ID, each prefixed with its length.
+_V1_MAGIC = b"PQ"
+_V1_HEADER = struct.Struct("<2sBI")
+_V1_PARCEL = struct.Struct("<B16sdqiHH")
+_HAS_ID, _HAS_TYPE, _HAS_SESSION = 1, 2, 4
+
+
+def encode_json(parcels: list[dict]) -> bytes:
+    data = parcels[0] if len(parcels) == 1 else {PARCEL_BATCH_KEY: parcels}
+    return json.dumps(data).encode()
+
+
+def decode_json(body: bytes) -> list[dict]:
+    data = json.loads(body.decode())
+    if PARCEL_BATCH_KEY in data:
+        return data[PARCEL_BATCH_KEY]
+    return [data]
+
+
+def _uuid_bytes(parcel_id) -> bytes:
+    return uuid.UUID(str(parcel_id)).bytes
+
+
+def _uuid_str(raw: bytes) -> str:
+    # Same as str(uuid.UUID(bytes=raw)), without building a UUID object
+    h = raw.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def encode_v1(parcels: list[dict]) -> bytes:
+    chunks = [_V1_HEADER.pack(_V1_MAGIC, 1, len(parcels))]
+    for data in parcels:
+        parcel_id = data.get("id")
+        parcel_type_id = data.get("parcel_type_id")
+        session_id = data.get("session_id")
+        name = data["name"].encode()
+        session = b"" if session_id is None else session_id.encode()
+        flags = (
+            (_HAS_ID if parcel_id is not None else 0)
+            | (_HAS_TYPE if parcel_type_id is not None else 0)
+            | (_HAS_SESSION if session_id is not None else 0)
+        )
+        chunks.append(
+            _V1_PARCEL.pack(
+                flags,
+                b"" if parcel_id is None else _uuid_bytes(parcel_id),
+                data["weight"],
+                data["content_value_cents"],
+                parcel_type_id or 0,
+                len(name),
+                len(session),
+            )
+        )
+        chunks.append(name)
+        chunks.append(session)
+    return b"".join(chunks)
+
+
+def decode_v1(body: bytes) -> list[dict]:
+    try:
+        magic, version, count = _V1_HEADER.unpack_from(body)
+        if magic != _V1_MAGIC or version != 1:
+            raise ValueError(f"Not a v1 parcels message: {magic!r} v{version}")
+
+        parcels = []
+        offset = _V1_HEADER.size
+        for _ in range(count):
+            (
+                flags,
+                parcel_id,
+                weight,
+                content_value_cents,
+                parcel_type_id,
+                name_length,
+                session_length,
+            ) = _V1_PARCEL.unpack_from(body, offset)
+            offset += _V1_PARCEL.size
+            name = body[offset : offset + name_length].decode()
+            offset += name_length
+            session = body[offset : offset + session_length].decode()
+            offset += session_length
+            parcels.append(
+                {
+                    "id": _uuid_str(parcel_id) if flags & _HAS_ID else None,
+                    "name": name,
+                    "weight": weight,
+                    "content_value_cents": content_value_cents,
+                    "parcel_type_id": parcel_type_id if flags & _HAS_TYPE else None,
+                    "session_id": session if flags & _HAS_SESSION else None,
+                }
+            )
+    except struct.error as e:
+        raise ValueError(f"Truncated v1 parcels message: {e}") from e
+    if offset != len(body):
+        raise ValueError("Trailing bytes after v1 parcels message")
+    return parcels
+
+
+ENCODERS: dict[str, Callable[[list[dict]], bytes]] = {
+    JSON_CONTENT_TYPE: encode_json,
+    PARCELS_V1_CONTENT_TYPE: encode_v1,
+}
+DECODERS: dict[str, Callable[[bytes], list[dict]]] = {
+    JSON_CONTENT_TYPE: decode_json,
+    PARCELS_V1_CONTENT_TYPE: decode_v1,
+}
+
+
+def encode(parcels: list[dict], content_type: str) -> bytes:
+    return ENCODERS[content_type](parcels)
+
+
+def decode(body: bytes, content_type: str | None = None) -> list[dict]:
+    """Decode a message body; messages without a content type are JSON."""
+    decoder = DECODERS.get(content_type or JSON_CONTENT_TYPE)
+    if decoder is None:
+        raise ValueError(f"Unsupported content type {content_type!r}")
+    return decoder(body)
@@ -0,0 +1,80 @@
+"""
+Compare consumer throughput of per-message handling and the batching mode.
+
+Runs against the in-memory broker stand-in and SQLite by default, or the
+database given with ``--db-url``:
+
+    python -m benchmarks.bench_consumer -n 5000 --batch-size 100
+"""
+
+import argparse
+import asyncio
+import time
+from unittest import mock
+
+from loguru import logger
+from tortoise import Tortoise
+
+from app import consumer
+from app.models.tortoise import Parcel, ParcelType
+from app.utils import usd_rate_source
+from tests.stub_broker import StubChannel
+
+USD_RATE = 90.0
+
+
+def payload(parcel_type_id: int, n: int) -> dict:
+    return {
+        "name": f"Parcel {n}",
+        "weight": 1.5,
+        "content_value_cents": 1000,
+        "delivery_cost_cents": None,
+        "parcel_type_id": parcel_type_id,
+        "parcel_type": "clothes",
+        "session_id": "bench",
+    }
+
+
+async def run(handler, parcel_type_id: int, total: int, flush=None) -> float:
+    channel = StubChannel()
+    messages = [channel.message(payload(parcel_type_id, n)) for n in range(total)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(message) for message in messages))
+    if flush is not None:
+        await flush()
+    elapsed = time.perf_counter() - started
+
+    assert len(channel.acked) == total, "not every message was acked"
+    return total / elapsed
+
+
+async def main(args: argparse.Namespace) -> None:
+    logger.remove()
+    await Tortoise.init(db_url=args.db_url, modules={"models": ["app.models.tortoise"]})
+    await Tortoise.generate_schemas()
+    parcel_type, _ = await ParcelType.get_or_create(name="clothes")
+
+    with mock.patch.object(usd_rate_source, "get_rate", return_value=USD_RATE):
+        single = await run(consumer.on_message, parcel_type.id, args.n)
+        batcher = consumer.ParcelBatcher(args.batch_size, args.flush_interval_ms / 1000)
+        batched = await run(
+            batcher.on_message, parcel_type.id, args.n, flush=batcher.flush
+        )
+
+    await Parcel.filter(session_id="bench").delete()
+    await Tortoise.close_connections()
+
+    print(f"messages:    {args.n}")
+    print(f"per-message  {single:10.1f} msg/s")
+    print(f"batch {args.batch_size:<5}  {batched:10.1f} msg/s")
+    print(f"speedup      {batched / single:10.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db-url", default="sqlite://:memory:")
+    parser.add_argument("-n", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--flush-interval-ms", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
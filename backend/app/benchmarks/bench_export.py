@@ -0,0 +1,154 @@
+"""
+Measure GET /parcels/export throughput and memory on a large session.
+
+Seeds one session with ``-n`` parcels in a temporary SQLite file by default,
+or in the database given with ``--db-url`` (run the migrations there first),
+then streams the export in each format through the ASGI app, discarding the
+body. The resident set size is sampled while streaming, so the growth over
+the size before the export shows whether memory stays flat:
+
+    python -m benchmarks.bench_export -n 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import time
+import uuid
+
+from loguru import logger
+from tortoise import Tortoise
+
+from app.main import create_app, session_manager
+from app.models.tortoise import Parcel, ParcelType
+
+
+SEED_BATCH = 10_000
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+async def seed(session_id: str, total: int) -> None:
+    parcel_type, _ = await ParcelType.get_or_create(name="clothes")
+    for start in range(0, total, SEED_BATCH):
+        await Parcel.bulk_create(
+            [
+                Parcel(
+                    id=uuid.uuid4(),
+                    name=f"Parcel {n}",
+                    weight=1.5,
+                    content_value_cents=1000,
+                    delivery_cost_cents=96750,
+                    parcel_type=parcel_type,
+                    session_id=session_id,
+                )
+                for n in range(start, min(start + SEED_BATCH, total))
+            ]
+        )
+
+
+async def export(app, session_id: str, format: str) -> tuple[int, int]:
+    """Stream one export through ``app``; return the body size and line count."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/parcels/export",
+        "raw_path": b"/parcels/export",
+        "query_string": f"format={format}".encode(),
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench"),
+            (b"cookie", f"session_id={session_id}".encode()),
+        ],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    disconnected = asyncio.Event()
+    requested = False
+    size = lines = 0
+
+    async def receive() -> dict:
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        nonlocal size, lines
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            size += len(body)
+            lines += body.count(b"\n")
+
+    await app(scope, receive, send)
+    return size, lines
+
+
+async def run(args: argparse.Namespace) -> None:
+    session_id = session_manager.create_session_id()
+    started = time.perf_counter()
+    await seed(session_id, args.n)
+    print(f"seeded {args.n} parcels in {time.perf_counter() - started:.1f} s")
+
+    app = create_app()
+    print(f"{'format':>7} {'rows/s':>10} {'MB/s':>8} {'rss MB':>8} {'growth MB':>10}")
+    for format in args.formats:
+        baseline = peak = rss_mb()
+
+        async def sample() -> None:
+            nonlocal peak
+            while True:
+                peak = max(peak, rss_mb())
+                await asyncio.sleep(0.01)
+
+        sampler = asyncio.create_task(sample())
+        started = time.perf_counter()
+        size, lines = await export(app, session_id, format)
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+        rows = lines - (format == "csv")
+        assert rows == args.n, f"exported {rows} of {args.n} rows"
+        print(
+            f"{format:>7} {rows / elapsed:>10.0f} {size / elapsed / 2**20:>8.1f} "
+            f"{peak:>8.1f} {peak - baseline:>10.1f}"
+        )
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"process peak RSS {peak_rss:.1f} MB")
+    await Parcel.filter(session_id=session_id).delete()
+
+
+async def main(args: argparse.Namespace) -> None:
+    logger.remove()
+    db_url = args.db_url or "sqlite://" + os.path.join(
+        tempfile.mkdtemp(), "bench_export.sqlite3"
+    )
+    await Tortoise.init(db_url=db_url, modules={"models": ["app.models.tortoise"]})
+    try:
+        await Tortoise.generate_schemas(safe=True)
+        await run(args)
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("-n", type=int, default=1_000_000)
+    parser.add_argument("--formats", nargs="+", default=["ndjson", "csv"])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,91 @@
+"""
+Measure POST /parcels throughput with logging off, with loguru's default
+synchronous sink and with the background sink from `app.log`.
+
+Runs the app in-process against SQLite with publishing stubbed out; log
+output goes to /dev/null so only the cost of producing it is measured.
+
+    python -m benchmarks.bench_logging --requests 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from httpx import AsyncClient
+from loguru import logger
+from tortoise import Tortoise
+
+from app.log import BackgroundSink
+from app.main import create_app
+from app.models.tortoise import ParcelType
+from app.producer import publisher
+
+
+PARCEL = {
+    "name": "Parcel",
+    "weight": 1.5,
+    "parcel_type": "clothes",
+    "parcel_type_id": None,
+    "content_value_cents": 1000,
+    "delivery_cost_cents": None,
+}
+
+
+async def publish(data: dict) -> None:
+    pass
+
+
+def use_sink(mode: str, devnull) -> None:
+    logger.remove()
+    if mode == "sync":
+        logger.add(devnull, level="DEBUG")
+    elif mode == "sync-info":
+        logger.add(devnull, level="INFO")
+    elif mode == "background":
+        logger.add(
+            BackgroundSink(devnull), level="INFO", format=lambda record: "{message}"
+        )
+
+
+async def run(client: AsyncClient, total: int, concurrency: int) -> float:
+    remaining = iter(range(total))
+
+    async def worker() -> None:
+        for _ in remaining:
+            response = await client.post("/parcels", json=PARCEL)
+            assert response.status_code == 202
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+
+async def main(args: argparse.Namespace) -> None:
+    await Tortoise.init(db_url=args.db_url, modules={"models": ["app.models.tortoise"]})
+    await Tortoise.generate_schemas(safe=True)
+    await ParcelType.get_or_create(name="clothes")
+    publisher.publish = publish
+
+    try:
+        with open(os.devnull, "w") as devnull:
+            async with AsyncClient(app=create_app(), base_url="http://bench") as client:
+                await run(client, 100, args.concurrency)
+                print(f"{'logging':>12} {'requests/s':>12}")
+                for mode in ("off", "sync", "sync-info", "background"):
+                    use_sink(mode, devnull)
+                    rps = await run(client, args.requests, args.concurrency)
+                    print(f"{mode:>12} {rps:>12.0f}")
+                logger.remove()
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db-url", default="sqlite://:memory:")
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    main_args = parser.parse_args()
+    asyncio.run(main(main_args))
@@ -0,0 +1,52 @@
+"""
+Measure the cost of recording metrics per event.
+
+    python -m benchmarks.bench_metrics --events 1000000
+"""
+
+import argparse
+import time
+
+from app.metrics import Counter, Histogram, Registry
+
+
+def measure(label: str, record, events: int) -> None:
+    started = time.perf_counter()
+    for _ in range(events):
+        record()
+    elapsed = time.perf_counter() - started
+    print(f"{label:>28} {elapsed / events * 1e6:>8.3f} µs/event")
+
+
+def main(args: argparse.Namespace) -> None:
+    registry = Registry()
+    counter = Counter("bench_events", "Events", registry=registry)
+    histogram = Histogram("bench_seconds", "Latency", registry=registry)
+    labeled = Histogram(
+        "bench_route_seconds", "Latency", ("method", "route"), registry=registry
+    )
+
+    measure("empty loop", lambda: None, args.events)
+    measure("counter.inc", counter.inc, args.events)
+    measure("histogram.observe", lambda: histogram.observe(0.0123), args.events)
+    measure(
+        "labels().observe",
+        lambda: labeled.labels("GET", "get_parcel_details").observe(0.0123),
+        args.events,
+    )
+
+    def timed() -> None:
+        with histogram.time():
+            pass
+
+    measure("histogram.time()", timed, args.events)
+
+    started = time.perf_counter()
+    registry.expose()
+    print(f"{'expose':>28} {(time.perf_counter() - started) * 1e3:>8.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    main(parser.parse_args())
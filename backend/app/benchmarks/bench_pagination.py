@@ -0,0 +1,84 @@
+"""
+Compare GET /parcels/my latency at growing page depth for offset and
+keyset (cursor) pagination.
+
+Seeds one session with ``-n`` parcels in SQLite by default, or in the
+database given with ``--db-url`` (run the migrations there first):
+
+    python -m benchmarks.bench_pagination -n 100000 --limit 50
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from httpx import AsyncClient
+from loguru import logger
+from tortoise import Tortoise
+
+from app.main import create_app
+from app.models.tortoise import Parcel, ParcelType
+from app.utils import encode_cursor
+
+SESSION_ID = "bench-pagination"
+
+
+async def seed(total: int) -> list[str]:
+    parcel_type, _ = await ParcelType.get_or_create(name="clothes")
+    parcels = [
+        Parcel(
+            id=uuid.uuid4(),
+            name=f"Parcel {n}",
+            weight=1.5,
+            content_value_cents=1000,
+            delivery_cost_cents=96750,
+            parcel_type=parcel_type,
+            session_id=SESSION_ID,
+        )
+        for n in range(total)
+    ]
+    await Parcel.bulk_create(parcels, batch_size=5000)
+    return sorted(str(parcel.id) for parcel in parcels)
+
+
+async def timed_get(client: AsyncClient, params: dict, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = await client.get("/parcels/my", params=params)
+        assert response.status_code == 200
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+async def main(args: argparse.Namespace) -> None:
+    logger.remove()
+    await Tortoise.init(db_url=args.db_url, modules={"models": ["app.models.tortoise"]})
+    await Tortoise.generate_schemas(safe=True)
+    ids = await seed(args.n)
+
+    async with AsyncClient(app=create_app(), base_url="http://bench") as client:
+        client.cookies.set("session_id", SESSION_ID)
+        print(f"{'depth':>10} {'offset ms':>10} {'cursor ms':>10}")
+        depth = 0
+        while depth < args.n:
+            offset_ms = await timed_get(
+                client, {"skip": depth, "limit": args.limit}, args.repeat
+            )
+            params = {"limit": args.limit}
+            if depth:
+                params["cursor"] = encode_cursor(ids[depth - 1])
+            cursor_ms = await timed_get(client, params, args.repeat)
+            print(f"{depth:>10} {offset_ms:>10.2f} {cursor_ms:>10.2f}")
+            depth = depth * 4 if depth else args.limit * 4
+
+    await Parcel.filter(session_id=SESSION_ID).delete()
+    await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db-url", default="sqlite://:memory:")
+    parser.add_argument("-n", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,226 @@
+"""
+Load-test the intake -> price -> persist pipeline in one process.
+
+The app is driven with httpx's ``AsyncClient``: parcels are posted with
+``--concurrency`` requests in flight, published to an in-memory parcel_queue
+(`tests.stub_broker.StubQueue`) and saved by a `app.consumer.Consumer`
+running alongside, with a fixed USD rate in place of the CBR API. Then every
+parcel is fetched by ID and the session's parcels are paged through.
+
+Reports throughput and p50/p95/p99 latency of POST /parcels, GET /parcels/{id},
+GET /parcels/my and of publish-to-commit in the consumer. The database is
+``DATABASE_TEST_URL`` (SQLite in memory if unset; run the migrations on
+MySQL first). Save results with ``--output`` and compare two runs with
+``--compare``:
+
+    python -m benchmarks.bench_pipeline -n 5000 --output before.json
+    python -m benchmarks.bench_pipeline -n 5000 --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import time
+from typing import Awaitable, Callable, Optional
+from unittest import mock
+
+import numpy as np
+from httpx import AsyncClient
+from loguru import logger
+from tortoise import Tortoise
+
+from app import consumer, producer
+from app.main import create_app, session_manager
+from app.models.tortoise import Parcel, ParcelType
+from app.utils import usd_rate_cache, usd_rate_source
+from tests.stub_broker import StubQueue
+
+
+USD_RATE = 90.0
+PARCEL = {
+    "name": "Parcel",
+    "weight": 1.5,
+    "parcel_type": "clothes",
+    "parcel_type_id": None,
+    "content_value_cents": 10,
+    "delivery_cost_cents": None,
+}
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    """Throughput and latency percentiles of requests taking ``latencies`` seconds."""
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "count": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+    }
+
+
+async def load(
+    request: Callable[[int], Awaitable[None]], total: int, concurrency: int
+) -> dict:
+    """Run ``request(n)`` for n in range(total), ``concurrency`` at a time."""
+    remaining = iter(range(total))
+    latencies = []
+
+    async def worker() -> None:
+        for n in remaining:
+            started = time.perf_counter()
+            await request(n)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run(queue: StubQueue, session_id: str, args: argparse.Namespace) -> dict:
+    worker = consumer.Consumer(
+        "amqp://stub/",
+        concurrency=args.consumer_concurrency,
+        batch_size=args.batch_size,
+        flush_interval=args.flush_interval_ms / 1000,
+    )
+    consuming = asyncio.create_task(queue.consume(worker.handle, args.prefetch))
+    ids: list[str] = []
+    results = {}
+
+    async with AsyncClient(app=create_app(), base_url="http://bench") as client:
+        client.cookies.set("session_id", session_id)
+
+        async def post_parcel(n: int) -> None:
+            response = await client.post("/parcels", json=PARCEL)
+            assert response.status_code == 202, response.text
+            ids.append(response.json()["id"])
+
+        started = time.perf_counter()
+        results["POST /parcels"] = await load(post_parcel, args.n, args.concurrency)
+        while queue.pending or queue.channel.unsettled:
+            await worker.drain()
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - started
+        consuming.cancel()
+
+        channel = queue.channel
+        assert not channel.rejected, f"{len(channel.rejected)} messages rejected"
+        results["publish -> commit"] = summarize(
+            [
+                channel.settled_at[tag] - published_at
+                for tag, published_at in queue.published_at.items()
+            ],
+            elapsed,
+        )
+
+        async def get_parcel(n: int) -> None:
+            response = await client.get(f"/parcels/{ids[n]}")
+            assert response.status_code == 200, response.text
+
+        results["GET /parcels/{id}"] = await load(get_parcel, args.n, args.concurrency)
+
+        cursors: list[Optional[str]] = [None]
+
+        async def get_page(n: int) -> None:
+            params = {"limit": args.page_size}
+            if cursors[-1] is not None:
+                params["cursor"] = cursors[-1]
+            response = await client.get("/parcels/my", params=params)
+            assert response.status_code == 200, response.text
+            cursors.append(response.headers.get("x-next-cursor"))
+
+        # Pages follow each other's cursors, so they are fetched one at a time
+        pages = -(-args.n // args.page_size)
+        results["GET /parcels/my"] = await load(get_page, pages, 1)
+
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results: dict, baseline: Optional[dict]) -> None:
+    header = (
+        f"{'':22} {'count':>7} {'per s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    if baseline is not None:
+        header += f" {'p95 vs base':>12}"
+    print(header)
+    for name, result in results.items():
+        line = (
+            f"{name:22} {result['count']:>7} {result['throughput']:>9.0f} "
+            f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+        )
+        base = (baseline or {}).get(name)
+        if base is not None:
+            line += f" {result['p95_ms'] / base['p95_ms']:>11.2f}x"
+        print(line)
+
+
+async def main(args: argparse.Namespace) -> None:
+    logger.remove()
+    await Tortoise.init(db_url=args.db_url, modules={"models": ["app.models.tortoise"]})
+    await Tortoise.generate_schemas(safe=True)
+    await ParcelType.get_or_create(name="clothes")
+    usd_rate_cache.invalidate()
+
+    queue = StubQueue()
+    session_id = session_manager.create_session_id()
+    try:
+        # send_to_queue publishes through the module-level publisher
+        with mock.patch.object(producer, "publisher", queue), mock.patch.object(
+            usd_rate_source, "get_rate", return_value=USD_RATE
+        ):
+            results = await run(queue, session_id, args)
+        await Parcel.filter(session_id=session_id).delete()
+    finally:
+        await Tortoise.close_connections()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "time": time.time(),
+                    "args": vars(args),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--db-url", default=os.getenv("DATABASE_TEST_URL") or "sqlite://:memory:"
+    )
+    parser.add_argument("-n", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--prefetch", type=int, default=200)
+    parser.add_argument("--consumer-concurrency", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--flush-interval-ms", type=int, default=50)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,49 @@
+"""
+Compare scalar and vectorized delivery cost pricing.
+
+    python -m benchmarks.bench_pricing --sizes 1000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.utils import calculate_delivery_cost, calculate_delivery_costs
+
+
+USD_RATE = 91.2345
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = np.random.default_rng(0)
+    print(f"{'parcels':>10} {'loop/s':>14} {'vectorized/s':>14} {'speedup':>8}")
+    for size in args.sizes:
+        weights = rng.uniform(0, 100, size).round(3)
+        values = rng.integers(0, 10_000_000, size)
+        weights_list, values_list = weights.tolist(), values.tolist()
+
+        started = time.perf_counter()
+        looped = [
+            calculate_delivery_cost(w, v, USD_RATE)
+            for w, v in zip(weights_list, values_list)
+        ]
+        loop_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        vectorized = calculate_delivery_costs(weights, values, USD_RATE)
+        vectorized_elapsed = time.perf_counter() - started
+
+        assert vectorized.tolist() == looped, "vectorized result differs"
+        print(
+            f"{size:>10} {size / loop_elapsed:>14.0f} "
+            f"{size / vectorized_elapsed:>14.0f} "
+            f"{loop_elapsed / vectorized_elapsed:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000]
+    )
+    main(parser.parse_args())
@@ -0,0 +1,85 @@
+"""
+Compare per-row cost of building GET /parcels/my responses with
+`ParcelOut.from_orm` and with the `.values()` + `ParcelOut.from_row` path.
+
+    python -m benchmarks.bench_serialization --sizes 10 100 1000
+"""
+
+import argparse
+import asyncio
+import time
+
+from loguru import logger
+from tortoise import Tortoise
+
+from app.models.pydantic import ParcelOut, ParcelOutList
+from app.models.tortoise import Parcel, ParcelType
+
+SESSION_ID = "bench-serialization"
+
+
+async def orm_page(limit: int) -> bytes:
+    parcels = (
+        await Parcel.filter(session_id=SESSION_ID)
+        .prefetch_related("parcel_type")
+        .order_by("id")
+        .limit(limit)
+    )
+    return ParcelOutList.dump_json([await ParcelOut.from_orm(p) for p in parcels])
+
+
+async def values_page(limit: int) -> bytes:
+    rows = (
+        await Parcel.filter(session_id=SESSION_ID)
+        .order_by("id")
+        .limit(limit)
+        .values(*ParcelOut.VALUES_FIELDS)
+    )
+    return ParcelOutList.dump_json([ParcelOut.from_row(row) for row in rows])
+
+
+async def per_row_us(build, limit: int, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await build(limit)
+    return (time.perf_counter() - started) / repeat / limit * 1e6
+
+
+async def main(args: argparse.Namespace) -> None:
+    logger.remove()
+    await Tortoise.init(db_url=args.db_url, modules={"models": ["app.models.tortoise"]})
+    await Tortoise.generate_schemas(safe=True)
+    parcel_type, _ = await ParcelType.get_or_create(name="clothes")
+    await Parcel.bulk_create(
+        [
+            Parcel(
+                name=f"Parcel {n}",
+                weight=1.5,
+                content_value_cents=1000,
+                delivery_cost_cents=96750,
+                parcel_type=parcel_type,
+                session_id=SESSION_ID,
+            )
+            for n in range(max(args.sizes))
+        ]
+    )
+
+    for limit in args.sizes:
+        assert await orm_page(limit) == await values_page(limit)
+
+    print(f"{'page size':>10} {'from_orm us/row':>16} {'from_row us/row':>16}")
+    for limit in args.sizes:
+        orm_us = await per_row_us(orm_page, limit, args.repeat)
+        values_us = await per_row_us(values_page, limit, args.repeat)
+        print(f"{limit:>10} {orm_us:>16.1f} {values_us:>16.1f}")
+
+    await Parcel.filter(session_id=SESSION_ID).delete()
+    await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db-url", default="sqlite://:memory:")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
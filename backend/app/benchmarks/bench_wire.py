@@ -0,0 +1,66 @@
+"""
+Compare the JSON and v1 binary encodings of parcel_queue messages: encode
+and decode time per parcel and bytes per parcel, for single parcels and
+batch envelopes.
+
+    python -m benchmarks.bench_wire --batch-sizes 1 100 1000
+"""
+
+import argparse
+import time
+import uuid
+
+from app import wire
+
+
+
+def payload(n: int) -> dict:
+    # A parcel as queued by POST /parcels
+    return {
+        "name": f"Parcel {n}",
+        "weight": 1.5 + n % 10,
+        "parcel_type": "clothes",
+        "parcel_type_id": 1,
+        "content_value_cents": 1000 + n,
+        "delivery_cost_cents": None,
+        "session_id": "e30.ZxY9Kw.ZkY6mUq3X1t2kWcT3bvvOeNmwJk",
+        "id": str(uuid.uuid4()),
+    }
+
+
+def timed(function, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def main(args: argparse.Namespace) -> None:
+    print(
+        f"{'batch':>6} {'format':>8} {'bytes/parcel':>13} "
+        f"{'encode µs/parcel':>17} {'decode µs/parcel':>17}"
+    )
+    for batch_size in args.batch_sizes:
+        parcels = [payload(n) for n in range(batch_size)]
+        repeat = max(1, args.parcels // batch_size)
+        for name, content_type in (
+            ("json", wire.JSON_CONTENT_TYPE),
+            ("v1", wire.PARCELS_V1_CONTENT_TYPE),
+        ):
+            body = wire.encode(parcels, content_type)
+            encode_s = timed(lambda: wire.encode(parcels, content_type), repeat)
+            decode_s = timed(lambda: wire.decode(body, content_type), repeat)
+            print(
+                f"{batch_size:>6} {name:>8} {len(body) / batch_size:>13.1f} "
+                f"{encode_s / batch_size * 1e6:>17.2f} "
+                f"{decode_s / batch_size * 1e6:>17.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument(
+        "--parcels", type=int, default=100_000, help="parcels per measurement"
+    )
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+"""
+Measure consumer throughput with 1, 2, 4 and 8 worker processes.
+
+A multiprocessing queue stands in for RabbitMQ: the parent publishes the
+messages in chunks and every worker feeds them, as stub messages, to its
+own `app.consumer.Consumer`. Each worker uses a private in-memory SQLite
+database by default, so the figures show how the consumer itself scales;
+pass ``--db-url`` to share a real database (run the migrations there first):
+
+    python -m benchmarks.bench_workers -n 20000 --workers 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from unittest import mock
+
+from loguru import logger
+from tortoise import Tortoise
+
+from app import consumer
+from app.models.tortoise import ParcelType
+from app.utils import usd_rate_source
+from tests.stub_broker import StubChannel
+
+
+USD_RATE = 90.0
+CHUNK_SIZE = 100
+
+
+def payload(n: int) -> dict:
+    return {
+        "name": f"Parcel {n}",
+        "weight": 1.5,
+        "content_value_cents": 1000,
+        "delivery_cost_cents": None,
+        "parcel_type": "clothes",
+        "session_id": "bench-workers",
+    }
+
+
+async def consume(inbox, results, db_url: str, args: argparse.Namespace) -> None:
+    logger.remove()
+    await Tortoise.init(db_url=db_url, modules={"models": ["app.models.tortoise"]})
+    await Tortoise.generate_schemas(safe=True)
+    parcel_type, _ = await ParcelType.get_or_create(name="clothes")
+    worker = consumer.Consumer(
+        "amqp://stub/",
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        flush_interval=args.flush_interval_ms / 1000,
+    )
+    channel = StubChannel()
+    loop = asyncio.get_running_loop()
+    results.put("ready")
+
+    handled = 0
+    with mock.patch.object(usd_rate_source, "get_rate", return_value=USD_RATE):
+        while True:
+            chunk = await loop.run_in_executor(None, inbox.get)
+            if chunk is None:
+                break
+            for data in chunk:
+                data["parcel_type_id"] = parcel_type.id
+                # aio-pika runs each delivery as its own task
+                asyncio.create_task(worker.handle(channel.message(data)))
+            handled += len(chunk)
+            # Bound the local backlog like a prefetch window would
+            while len(channel.messages) - len(channel.acked) > args.prefetch:
+                await asyncio.sleep(0.001)
+        await asyncio.sleep(0)
+        await worker.drain()
+
+    await Tortoise.close_connections()
+    results.put(handled)
+
+
+def worker_main(inbox, results, db_url: str, args: argparse.Namespace) -> None:
+    asyncio.run(consume(inbox, results, db_url, args))
+
+
+def run(workers: int, args: argparse.Namespace) -> float:
+    context = multiprocessing.get_context("spawn")
+    inbox, results = context.Queue(), context.Queue()
+    processes = [
+        context.Process(target=worker_main, args=(inbox, results, args.db_url, args))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        assert results.get() == "ready"
+
+    started = time.perf_counter()
+    for start in range(0, args.n, CHUNK_SIZE):
+        inbox.put([payload(n) for n in range(start, min(start + CHUNK_SIZE, args.n))])
+    for _ in processes:
+        inbox.put(None)
+    handled = sum(results.get() for _ in processes)
+    elapsed = time.perf_counter() - started
+
+    for process in processes:
+        process.join()
+    assert handled == args.n, "not every message was handled"
+    return args.n / elapsed
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"messages: {args.n}, batch size {args.batch_size}")
+    print(f"{'workers':>8} {'msg/s':>10} {'scaling':>8}")
+    baseline = None
+    for workers in args.workers:
+        throughput = run(workers, args)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>10.0f} {throughput / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db-url", default="sqlite://:memory:")
+    parser.add_argument("-n", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--prefetch", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--flush-interval-ms", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `parcel` ADD INDEX `idx_parcel_session_18dcbb` (`session_id`);
+        ALTER TABLE `parcel` ADD INDEX `idx_parcel_session_f20abe` (`session_id`, `parcel_type_id`);
+        ALTER TABLE `parcel` ADD INDEX `idx_parcel_session_1c4fa9` (`session_id`, `delivery_cost_cents`);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `parcel` DROP INDEX `idx_parcel_session_18dcbb`;
+        ALTER TABLE `parcel` DROP INDEX `idx_parcel_session_f20abe`;
+        ALTER TABLE `parcel` DROP INDEX `idx_parcel_session_1c4fa9`;"""
@@ -0,0 +1,16 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS `parcel_outbox` (
+    `id` BIGINT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `body` LONGBLOB NOT NULL  COMMENT 'Encoded parcel_queue message',
+    `content_type` VARCHAR(64) NOT NULL  COMMENT 'AMQP content type of the body',
+    `created_at` DATETIME(6) NOT NULL  COMMENT 'When the API accepted the parcels' DEFAULT CURRENT_TIMESTAMP(6)
+) CHARACTER SET utf8mb4;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS `parcel_outbox`;"""
@@ -0,0 +1,22 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS `parcel_stats` (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `session_id` VARCHAR(255) NOT NULL  COMMENT 'Session of the parcels, empty if none' DEFAULT '',
+    `priced` BOOL NOT NULL  COMMENT 'Whether the parcels have a delivery cost',
+    `count` BIGINT NOT NULL  DEFAULT 0,
+    `total_weight` DOUBLE NOT NULL  DEFAULT 0,
+    `total_content_value_cents` BIGINT NOT NULL  DEFAULT 0,
+    `total_delivery_cost_cents` BIGINT NOT NULL  DEFAULT 0,
+    `parcel_type_id` INT NOT NULL COMMENT 'Type of the parcels',
+    UNIQUE KEY `uid_parcel_stat_session_9adb4d` (`session_id`, `parcel_type_id`, `priced`),
+    CONSTRAINT `fk_parcel_s_parcel_t_43629263` FOREIGN KEY (`parcel_type_id`) REFERENCES `parcel_types` (`id`) ON DELETE CASCADE
+) CHARACTER SET utf8mb4;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS `parcel_stats`;"""
@@ -0,0 +1,13 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `parcel` DROP INDEX `idx_parcel_session_18dcbb`;
+        ALTER TABLE `parcel` ADD INDEX `idx_parcel_session_92458b` (`session_id`, `id`);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `parcel` DROP INDEX `idx_parcel_session_92458b`;
+        ALTER TABLE `parcel` ADD INDEX `idx_parcel_session_18dcbb` (`session_id`);"""
@@ -0,0 +1,137 @@
+"""
+In-memory stand-in for the parts of aio-pika used by the consumer.
+
+Messages track their acks, rejects and nacks on a shared channel, following the
+AMQP rules for ``multiple=True`` acknowledgements. `StubQueue` connects a
+producer to a consumer through such a channel. Used by the tests and the
+benchmarks.
+"""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable
+
+from app import wire
+from app.producer import PUBLISHED_AT_HEADER
+
+
+class StubChannel:
+    def __init__(self):
+        self.messages: list["StubMessage"] = []
+        self.acked: set[int] = set()
+        self.rejected: set[int] = set()
+        self.requeued: set[int] = set()
+        # perf_counter() of every ack, reject or nack by delivery tag
+        self.settled_at: dict[int, float] = {}
+
+    def message(self, data: dict, content_type: str | None = None) -> "StubMessage":
+        """A delivery of ``data`` as JSON, or as a parcel list in ``content_type``."""
+        if content_type is None:
+            body = json.dumps(data).encode()
+        else:
+            body = wire.encode([data], content_type)
+        message = StubMessage(self, body, len(self.messages) + 1)
+        message.content_type = content_type
+        self.messages.append(message)
+        return message
+
+    def settle(self, delivery_tag: int, multiple: bool) -> None:
+        settled = self.acked | self.rejected | self.requeued
+        if delivery_tag in settled:
+            raise RuntimeError(f"Message {delivery_tag} already processed")
+        if multiple:
+            tags = {
+                m.delivery_tag for m in self.messages if m.delivery_tag <= delivery_tag
+            } - settled
+        else:
+            tags = {delivery_tag}
+        self.acked.update(tags)
+        now = time.perf_counter()
+        self.settled_at.update((tag, now) for tag in tags)
+
+    @property
+    def unsettled(self) -> int:
+        return (
+            len(self.messages)
+            - len(self.acked)
+            - len(self.rejected)
+            - len(self.requeued)
+        )
+
+
+class StubMessage:
+    def __init__(self, channel: StubChannel, body: bytes, delivery_tag: int):
+        self.channel = channel
+        self.body = body
+        self.delivery_tag = delivery_tag
+        self.headers: dict = {}
+        self.content_type = None
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.channel.settle(self.delivery_tag, multiple)
+
+    async def reject(self, requeue: bool = False) -> None:
+        self.channel.rejected.add(self.delivery_tag)
+        self.channel.settled_at[self.delivery_tag] = time.perf_counter()
+
+    async def nack(self, multiple: bool = False, requeue: bool = True) -> None:
+        target = self.channel.requeued if requeue else self.channel.rejected
+        target.add(self.delivery_tag)
+        self.channel.settled_at[self.delivery_tag] = time.perf_counter()
+
+    @asynccontextmanager
+    async def process(self, requeue: bool = False):
+        try:
+            yield self
+        except BaseException:
+            await self.reject(requeue=requeue)
+            raise
+        await self.ack()
+
+
+class StubQueue:
+    """
+    parcel_queue in memory: `publish` stands in for `Publisher.publish`, and
+    `consume` delivers the messages to a handler such as `Consumer.handle`,
+    keeping at most ``prefetch`` of them unsettled.
+    """
+
+    def __init__(self, content_type: str = wire.PARCELS_V1_CONTENT_TYPE):
+        self.content_type = content_type
+        self.channel = StubChannel()
+        # perf_counter() of every publish by delivery tag
+        self.published_at: dict[int, float] = {}
+        self._ready: asyncio.Queue[StubMessage] = asyncio.Queue()
+
+    async def publish(self, data: dict) -> None:
+        parcels = data.get(wire.PARCEL_BATCH_KEY, [data])
+        message = StubMessage(
+            self.channel,
+            wire.encode(parcels, self.content_type),
+            len(self.channel.messages) + 1,
+        )
+        message.content_type = self.content_type
+        message.headers[PUBLISHED_AT_HEADER] = time.time()
+        self.channel.messages.append(message)
+        self.published_at[message.delivery_tag] = time.perf_counter()
+        self._ready.put_nowait(message)
+
+    async def consume(
+        self, handle: Callable[[StubMessage], Awaitable[None]], prefetch: int = 200
+    ) -> None:
+        """Deliver messages until cancelled, each as its own task like aio-pika."""
+        tasks = set()
+        while True:
+            message = await self._ready.get()
+            while self.channel.unsettled - self._ready.qsize() > prefetch:
+                await asyncio.sleep(0.001)
+            task = asyncio.create_task(handle(message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    @property
+    def pending(self) -> int:
+        """Messages published but not yet handed to the consumer."""
+        return self._ready.qsize()
@@ -0,0 +1,130 @@
+import pytest
+from httpx import AsyncClient
+
+from app.admission import (
+    OPEN,
+    SHEDDING,
+    THROTTLED,
+    AdmissionController,
+    Overloaded,
+    TokenBuckets,
+)
+from app.models.tortoise import ParcelType
+from app.registry import parcel_type_registry
+
+
+class FakeQueue:
+    """Stands in for the passive declare of parcel_queue."""
+
+    def __init__(self, depth=0, consumers=1):
+        self.depth = depth
+        self.consumers = consumers
+        self.down = False
+
+    async def counts(self):
+        if self.down:
+            raise ConnectionError("broker unreachable")
+        return self.depth, self.consumers
+
+
+@pytest.mark.anyio
+async def test_admission_follows_queue_depth():
+    queue = FakeQueue()
+    controller = AdmissionController(
+        queue.counts,
+        enabled=True,
+        soft_watermark=100,
+        hard_watermark=1_000,
+        session_rate=1.0,
+        session_burst=2,
+    )
+
+    await controller.refresh()
+    assert controller.state == OPEN
+    for _ in range(5):
+        controller.admit("a")
+        controller.release()
+
+    queue.depth = 500
+    await controller.refresh()
+    assert controller.state == THROTTLED
+    controller.admit("a")
+    controller.admit("a")
+    with pytest.raises(Overloaded) as e:
+        controller.admit("a")
+    assert (e.value.reason, e.value.retry_after) == ("rate_limit", 1)
+    controller.admit("b", 2)
+
+    queue.depth = 1_000
+    await controller.refresh()
+    assert controller.state == SHEDDING
+    with pytest.raises(Overloaded) as e:
+        controller.admit("c")
+    assert e.value.reason == "queue_depth"
+
+    queue.down = True
+    await controller.refresh()
+    assert (controller.state, controller.depth) == (OPEN, None)
+    assert controller.in_flight == 3
+
+
+def test_admission_caps_in_flight():
+    controller = AdmissionController(None, enabled=True, max_in_flight=2)
+    controller.admit("a")
+    controller.admit("a")
+    with pytest.raises(Overloaded) as e:
+        controller.admit("b")
+    assert e.value.reason == "in_flight"
+    controller.release()
+    controller.admit("b")
+
+
+def test_token_bucket_admits_oversized_requests_from_a_full_bucket():
+    buckets = TokenBuckets(rate=10.0, burst=5)
+    assert buckets.take("a", 50) == 0
+    assert buckets.take("a", 1) == pytest.approx(0.1, abs=0.01)
+
+
+def test_zero_session_rate_sets_no_limit():
+    buckets = TokenBuckets(rate=0, burst=1)
+
+    assert [buckets.take("session", 10) for _ in range(3)] == [0, 0, 0]
+
+
+@pytest.mark.anyio
+async def test_create_parcel_is_refused_when_queue_is_backed_up(
+    client: AsyncClient, mocker
+):
+    queue = FakeQueue(depth=10)
+    controller = AdmissionController(
+        queue.counts, enabled=True, soft_watermark=5, hard_watermark=10
+    )
+    await controller.refresh()
+    mocker.patch("app.api.parcel.admission", controller)
+    send = mocker.patch("app.api.parcel.send_to_queue")
+    parcel_type = await ParcelType.create(name="admission-type")
+    parcel_type_registry.invalidate()
+    parcel = {
+        "name": "Parcel",
+        "weight": 1.5,
+        "content_value_cents": 1000,
+        "delivery_cost_cents": None,
+        "parcel_type_id": None,
+        "parcel_type": "admission-type",
+    }
+
+    response = await client.post("/parcels", json=parcel)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    send.assert_not_called()
+
+    queue.depth = 0
+    await controller.refresh()
+    response = await client.post("/parcels/batch", json=[parcel, parcel])
+
+    assert response.status_code == 202
+    send.assert_called_once()
+    assert controller.in_flight == 0
+
+    await parcel_type.delete()
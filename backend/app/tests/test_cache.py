@@ -0,0 +1,110 @@
+import pytest
+from httpx import AsyncClient
+
+from app.cache import PARCEL_CACHE_CHANNEL, ParcelCache, parcel_cache
+from app.models.tortoise import Parcel, ParcelType
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.published = []
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def set(self, key, value, ex=None):
+        self.commands.append(lambda values: values.__setitem__(key, value))
+
+    def delete(self, *keys):
+        for key in keys:
+            self.commands.append(lambda values, key=key: values.pop(key, None))
+
+    def publish(self, channel, message):
+        self.redis.published.append((channel, message))
+
+    async def execute(self):
+        for command in self.commands:
+            command(self.redis.values)
+
+
+@pytest.mark.anyio
+async def test_parcel_cache_tiers_and_bounds():
+    redis = FakeRedis()
+    writer = ParcelCache(redis)
+    reader = ParcelCache(redis, max_items=2)
+
+    await writer.put_shared({"a": b"1", "b": b"22", "c": b"333"})
+    assert [await reader.get(key) for key in "abc"] == [b"1", b"22", b"333"]
+    assert await reader.get("c") == b"333"
+    assert await reader.get("missing") is None
+
+    assert reader.stats() == {
+        "local_hits": 1,
+        "redis_hits": 3,
+        "misses": 1,
+        "hit_ratio": 0.8,
+        "items": 2,
+        "bytes": 5,
+    }
+
+
+@pytest.mark.anyio
+async def test_invalidate_drops_both_tiers_and_notifies():
+    redis = FakeRedis()
+    cache = ParcelCache(redis)
+    await cache.put("a", b"1")
+    await cache.put("b", b"22")
+
+    await cache.invalidate(["a"])
+
+    assert await cache.get("a") is None
+    assert await cache.get("b") == b"22"
+    assert cache.stats()["bytes"] == 2
+    assert redis.published == [(PARCEL_CACHE_CHANNEL, '["a"]')]
+
+
+@pytest.mark.anyio
+async def test_get_parcel_details_is_cached(client: AsyncClient, mocker):
+    mocker.patch.object(parcel_cache, "redis", FakeRedis())
+    parcel_cache.clear()
+    parcel_type = await ParcelType.create(name="cached-type")
+    parcel = await Parcel.create(
+        name="Parcel",
+        weight=1.5,
+        content_value_cents=1000,
+        delivery_cost_cents=96750,
+        parcel_type=parcel_type,
+        session_id="cache-session",
+    )
+
+    response = await client.get(f"/parcels/{parcel.id}")
+    assert response.status_code == 200
+    assert response.json()["id"] == str(parcel.id)
+    etag = response.headers["ETag"]
+
+    await parcel.delete()
+    response = await client.get(f"/parcels/{parcel.id}")
+    assert response.status_code == 200
+    response = await client.get(
+        f"/parcels/{parcel.id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    parcel_cache.clear()
+    await parcel_type.delete()
@@ -0,0 +1,221 @@
+import asyncio
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+from app.cache import parcel_cache
+from app.consumer import Consumer, ParcelBatcher, on_message
+from app.consumer_runner import ConsumerRunner, desired_workers
+from app.models.tortoise import Parcel, ParcelType
+from app.producer import batch_envelope
+from app.registry import parcel_type_registry
+from app.utils import usd_rate_cache, usd_rate_source
+from tests.stub_broker import StubChannel
+
+
+def parcel_payload(parcel_type_id, name="Parcel for testing", weight=1.5):
+    return {
+        "name": name,
+        "weight": weight,
+        "content_value_cents": 1000,
+        "delivery_cost_cents": None,
+        "parcel_type_id": parcel_type_id,
+        "parcel_type": "clothes",
+        "session_id": "batch-session",
+    }
+
+
+@pytest.mark.anyio
+async def test_batcher_saves_and_acks_batch(client: AsyncClient, mocker):
+    mocker.patch.object(usd_rate_source, "get_rate", return_value=90.0)
+    put_shared = mocker.patch.object(parcel_cache, "put_shared")
+    parcel_type = await ParcelType.create(name="batch-clothes")
+    parcel_type_registry.invalidate()
+    usd_rate_cache.invalidate()
+    channel = StubChannel()
+    batcher = ParcelBatcher(batch_size=3, flush_interval=60)
+
+    for n in range(3):
+        await batcher.on_message(channel.message(parcel_payload(parcel_type.id)))
+
+    assert channel.acked == {1, 2, 3}
+    parcels = await Parcel.filter(session_id="batch-session")
+    assert len(parcels) == 3
+    assert all(p.delivery_cost_cents == 96750 for p in parcels)
+    (cached,) = put_shared.call_args.args
+    assert set(cached) == {str(p.id) for p in parcels}
+
+    await Parcel.filter(session_id="batch-session").delete()
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_batcher_isolates_poison_message(client: AsyncClient, mocker):
+    mocker.patch.object(usd_rate_source, "get_rate", return_value=90.0)
+    parcel_type = await ParcelType.create(name="batch-poison")
+    parcel_type_registry.invalidate()
+    usd_rate_cache.invalidate()
+    channel = StubChannel()
+    batcher = ParcelBatcher(batch_size=10, flush_interval=60)
+
+    await batcher.on_message(channel.message(parcel_payload(parcel_type.id)))
+    await batcher.on_message(channel.message({"name": "no weight"}))
+    await batcher.on_message(channel.message(parcel_payload(parcel_type.id)))
+    await batcher.flush()
+
+    assert channel.acked == {1, 3}
+    assert channel.rejected == {2}
+    assert await Parcel.filter(session_id="batch-session").count() == 2
+
+    await Parcel.filter(session_id="batch-session").delete()
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_on_message_saves_batch_envelope(client: AsyncClient, mocker):
+    mocker.patch.object(usd_rate_source, "get_rate", return_value=90.0)
+    usd_rate_cache.invalidate()
+    parcel_type = await ParcelType.create(name="batch-envelope")
+    parcel_type_registry.invalidate()
+    parcels = [
+        parcel_payload(parcel_type.id) | {"id": str(uuid.uuid4())} for _ in range(3)
+    ]
+    channel = StubChannel()
+
+    await on_message(channel.message(batch_envelope(parcels)))
+
+    assert channel.acked == {1}
+    saved = await Parcel.filter(session_id="batch-session").order_by("id")
+    assert sorted(p["id"] for p in parcels) == [str(p.id) for p in saved]
+
+    await Parcel.filter(session_id="batch-session").delete()
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_redelivered_parcel_is_saved_once(client: AsyncClient, mocker):
+    mocker.patch.object(usd_rate_source, "get_rate", return_value=90.0)
+    usd_rate_cache.invalidate()
+    put_shared = mocker.patch.object(parcel_cache, "put_shared")
+    publish_saved = mocker.patch("app.consumer.parcel_events.publish_saved")
+    parcel_type = await ParcelType.create(name="redelivery")
+    parcel_type_registry.invalidate()
+    data = parcel_payload(parcel_type.id) | {"id": str(uuid.uuid4())}
+    channel = StubChannel()
+    batcher = ParcelBatcher(batch_size=2, flush_interval=60)
+
+    await on_message(channel.message(data))
+    await on_message(channel.message(data | {"weight": 2.5}))
+    await batcher.on_message(channel.message(data))
+    await batcher.on_message(channel.message(data))
+
+    assert channel.acked == {1, 2, 3, 4}
+    assert await Parcel.filter(session_id="batch-session").count() == 1
+    # Only the delivery that inserted the row is cached and published
+    cached = [list(call.args[0]) for call in put_shared.call_args_list]
+    assert [ids for ids in cached if ids] == [[data["id"]]]
+    published = [call.args[0] for call in publish_saved.call_args_list]
+    assert [[p.weight for p in saved] for saved in published if saved] == [[1.5]]
+
+    await Parcel.filter(session_id="batch-session").delete()
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_consumer_bounds_concurrency_and_drains(mocker):
+    running, peak, done = 0, 0, []
+
+    async def handle(message):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        done.append(message)
+
+    mocker.patch("app.consumer.on_message", side_effect=handle)
+    consumer = Consumer("amqp://test/", concurrency=3, batch_size=1)
+    channel = StubChannel()
+
+    for n in range(10):
+        asyncio.create_task(consumer.handle(channel.message({"n": n})))
+    await asyncio.sleep(0)
+    await consumer.drain(timeout=5)
+
+    assert len(done) == 10
+    assert peak == 3
+
+
+@pytest.mark.anyio
+async def test_consumer_stop_writes_buffered_batch(mocker):
+    process_batch = mocker.patch("app.consumer.process_batch")
+    mocker.patch("app.consumer.Tortoise.close_connections")
+    consumer = Consumer("amqp://test/", batch_size=10, flush_interval=60)
+    consumer._queue = mocker.AsyncMock()
+    consumer._consumer_tag = "consumer-tag"
+    channel = StubChannel()
+
+    await consumer.handle(channel.message({"n": 1}))
+    await consumer.stop(timeout=5)
+    # Delivered before the cancel took effect: left for redelivery
+    await consumer.handle(channel.message({"n": 2}))
+
+    ((messages, _),) = [call.args for call in process_batch.call_args_list]
+    assert [message.delivery_tag for message in messages] == [1]
+    consumer._queue.cancel.assert_awaited_once_with("consumer-tag")
+
+
+def test_desired_workers_follows_queue_depth():
+    assert desired_workers(0, 1000, 1, 8) == 1
+    assert desired_workers(2500, 1000, 1, 8) == 3
+    assert desired_workers(1_000_000, 1000, 1, 8) == 8
+
+
+class FakeProcess:
+    """A worker process that ignores SIGTERM until it is killed."""
+
+    def __init__(self, events, target, args, name):
+        self.events = events
+        self.port = args[0]
+        self.name = name
+        self.pid = None
+        self.exitcode = None
+        self.alive = False
+
+    def start(self):
+        self.alive = True
+        self.events.append(("start", self.name, self.port))
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.events.append(("terminate", self.name))
+
+    def kill(self):
+        self.alive = False
+        self.events.append(("kill", self.name))
+
+    def join(self, timeout=None):
+        if not self.alive:
+            self.events.append(("join", self.name))
+
+
+@pytest.mark.anyio
+async def test_runner_reaps_stopped_worker_before_reusing_its_port(mocker):
+    events = []
+    runner = ConsumerRunner(2, 10, 1, metrics_port=9100, stop_timeout=0.2)
+    runner._context = mocker.Mock()
+    runner._context.Process.side_effect = lambda **kwargs: FakeProcess(events, **kwargs)
+
+    await runner.resize(2)
+    await runner.resize(1)
+    await runner.resize(2)
+
+    assert events[2:] == [
+        ("terminate", "consumer-1"),
+        ("kill", "consumer-1"),
+        ("join", "consumer-1"),
+        ("start", "consumer-1", 9101),
+    ]
@@ -0,0 +1,110 @@
+import uuid
+
+import pytest
+from httpx import AsyncClient
+from tortoise import Tortoise, connections
+from tortoise.transactions import in_transaction
+
+from app.config import get_settings
+from app.db import (
+    WRITE_CONNECTION,
+    database_config,
+    read_from_primary,
+    with_pool_size,
+)
+from app.main import create_app
+from app.models.tortoise import Parcel, ParcelType
+from app.registry import parcel_type_registry
+from app.session import READ_PRIMARY_COOKIE
+
+
+@pytest.fixture
+async def replicated_db(tmp_path, monkeypatch):
+    """A primary and a "replica" that is never caught up, as two SQLite files."""
+    primary = f"sqlite://{tmp_path / 'primary.sqlite3'}"
+    replica = f"sqlite://{tmp_path / 'replica.sqlite3'}"
+    # Tortoise.init updates the connections of the first init in place,
+    # which are those of the other test modules; put them back afterwards
+    previous_connections = dict(connections._db_config or {})
+    for url in (primary, replica):
+        await Tortoise.init(db_url=url, modules={"models": ["app.models.tortoise"]})
+        await Tortoise.generate_schemas()
+        await Tortoise.close_connections()
+
+    monkeypatch.setenv("DATABASE_URL", primary)
+    monkeypatch.setenv("DATABASE_REPLICA_URL", replica)
+    await Tortoise.init(config=database_config())
+    parcel_type_registry.invalidate()
+    yield await ParcelType.create(name="replicated")
+    parcel_type_registry.invalidate()
+    await Tortoise.close_connections()
+    connections.db_config.clear()
+    connections.db_config.update(previous_connections)
+
+
+def new_parcel(parcel_type, session_id="replicated-session"):
+    return Parcel(
+        id=uuid.uuid4(),
+        name="Parcel",
+        weight=1.5,
+        content_value_cents=1000,
+        delivery_cost_cents=96750,
+        parcel_type=parcel_type,
+        session_id=session_id,
+    )
+
+
+@pytest.mark.anyio
+async def test_reads_go_to_replica_unless_primary_is_asked_for(replicated_db):
+    parcel = new_parcel(replicated_db)
+    await parcel.save()
+
+    assert not await Parcel.filter(id=parcel.id).exists()
+    with read_from_primary():
+        assert await Parcel.filter(id=parcel.id).exists()
+    async with in_transaction(WRITE_CONNECTION):
+        assert await Parcel.filter(id=parcel.id).exists()
+    assert await parcel_type_registry.get_id("replicated") == replicated_db.id
+
+
+@pytest.mark.anyio
+async def test_session_reads_its_writes_for_a_window(replicated_db, mocker):
+    mocker.patch.object(get_settings(), "read_your_writes_window", 5.0)
+    mocker.patch("app.api.parcel.send_to_queue")
+    mocker.patch("app.api.parcel.parcel_cache.get", return_value=None)
+    mocker.patch("app.api.parcel.parcel_cache.put")
+    parcel = new_parcel(replicated_db)
+    await parcel.save()
+
+    async with AsyncClient(app=create_app(), base_url="http://test") as client:
+        response = await client.get(f"/parcels/{parcel.id}")
+        assert response.status_code == 404
+        assert READ_PRIMARY_COOKIE not in response.cookies
+
+        response = await client.post(
+            "/parcels",
+            json={
+                "name": "Parcel",
+                "weight": 1.5,
+                "content_value_cents": 10,
+                "delivery_cost_cents": None,
+                "parcel_type_id": None,
+                "parcel_type": "replicated",
+            },
+        )
+        assert response.status_code == 202
+        assert READ_PRIMARY_COOKIE in response.cookies
+
+        response = await client.get(f"/parcels/{parcel.id}")
+        assert response.status_code == 200
+
+
+def test_pool_size_is_set_per_url():
+    assert (
+        with_pool_size("mysql://root:example@db/parcel_dev?charset=utf8mb4", 20)
+        == "mysql://root:example@db/parcel_dev?charset=utf8mb4&maxsize=20"
+    )
+    assert with_pool_size("mysql://root:example@db/parcel_dev", None) == (
+        "mysql://root:example@db/parcel_dev"
+    )
+    assert with_pool_size("sqlite://:memory:", 20) == "sqlite://:memory:"
@@ -0,0 +1,96 @@
+import json
+import uuid
+
+import pytest
+
+from app.events import ParcelEventHub
+from app.models.tortoise import Parcel
+
+
+class FakeRedis:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+
+def parcel(session_id, cost=100):
+    return Parcel(
+        id=uuid.uuid4(),
+        name="Parcel",
+        weight=1.0,
+        content_value_cents=100,
+        delivery_cost_cents=cost,
+        session_id=session_id,
+    )
+
+
+@pytest.mark.anyio
+async def test_saved_parcels_reach_streams_of_their_session():
+    redis = FakeRedis()
+    hub = ParcelEventHub(redis, heartbeat_interval=60)
+    mine, theirs = hub.stream("mine"), hub.stream("theirs")
+    assert await anext(mine) == b": connected\n\n"
+    assert await anext(theirs) == b": connected\n\n"
+    saved = parcel("mine", cost=250)
+
+    await hub.publish_saved([saved, parcel(None)])
+    ((channel, message),) = redis.published
+    hub.dispatch(json.loads(message))
+
+    event = await anext(mine)
+    assert event.startswith(b"event: parcel_saved\ndata: ")
+    # The session id is the session cookie and never reaches the client
+    assert json.loads(event.split(b"data: ")[1]) == {
+        "id": str(saved.id),
+        "delivery_cost_cents": 250,
+    }
+    assert hub.subscribers == 2
+    await mine.aclose()
+    await theirs.aclose()
+    assert hub.subscribers == 0
+
+
+@pytest.mark.anyio
+async def test_idle_stream_sends_heartbeat():
+    hub = ParcelEventHub(FakeRedis(), heartbeat_interval=0.01)
+    stream = hub.stream("idle")
+    await anext(stream)
+
+    assert await anext(stream) == b": heartbeat\n\n"
+    await stream.aclose()
+
+
+@pytest.mark.anyio
+async def test_slow_stream_is_closed_on_overflow():
+    hub = ParcelEventHub(FakeRedis(), max_queued=2, heartbeat_interval=60)
+    stream = hub.stream("slow")
+    await anext(stream)
+
+    hub.dispatch([{"id": str(n), "session_id": "slow"} for n in range(3)])
+
+    assert await anext(stream) == b"event: overflow\ndata: {}\n\n"
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+    assert hub.subscribers == 0
+
+
+class FailingRedis:
+    def __init__(self):
+        self.calls = 0
+
+    async def publish(self, channel, message):
+        self.calls += 1
+        raise ConnectionError("redis unreachable")
+
+
+@pytest.mark.anyio
+async def test_publish_backs_off_while_redis_fails():
+    redis = FailingRedis()
+    hub = ParcelEventHub(redis, retry_after=60)
+
+    for _ in range(3):
+        await hub.publish_saved([parcel("session")])
+
+    assert redis.calls == 1
@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+from app.main import session_manager
+from app.models.tortoise import Parcel, ParcelType
+from app.registry import parcel_type_registry
+
+
+@pytest.mark.anyio
+async def test_export_streams_session_parcels_in_chunks(client: AsyncClient, mocker):
+    mocker.patch("app.api.parcel.EXPORT_CHUNK_SIZE", 2)
+    session_id = session_manager.create_session_id()
+    parcel_type = await ParcelType.create(name="export-type")
+    parcel_type_registry.invalidate()
+    parcels = [
+        await Parcel.create(
+            id=uuid.uuid4(),
+            name=f"Parcel, {n}",
+            weight=1.5,
+            content_value_cents=1000,
+            delivery_cost_cents=None if n == 0 else 500,
+            parcel_type=parcel_type,
+            session_id=session_id,
+        )
+        for n in range(5)
+    ]
+    expected = sorted(str(parcel.id) for parcel in parcels)
+    client.cookies.set("session_id", session_id)
+
+    response = await client.get("/parcels/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == expected
+    assert rows[0]["parcel_type"] == "export-type"
+    assert "session_id" not in rows[0]
+
+    response = await client.get(
+        "/parcels/export",
+        params={"format": "csv", "parcel_type_id": parcel_type.id},
+    )
+
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["id"] for row in rows] == expected
+    assert {row["name"] for row in rows} == {f"Parcel, {n}" for n in range(5)}
+
+    client.cookies.delete("session_id")
+    await Parcel.filter(session_id=session_id).delete()
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_export_never_includes_other_sessions(client: AsyncClient):
+    parcel_type = await ParcelType.create(name="export-other-type")
+    parcel_type_registry.invalidate()
+    await Parcel.create(
+        id=uuid.uuid4(),
+        name="Someone else's parcel",
+        weight=1.5,
+        content_value_cents=1000,
+        delivery_cost_cents=500,
+        parcel_type=parcel_type,
+        session_id=session_manager.create_session_id(),
+    )
+
+    response = await client.get(
+        "/parcels/export",
+        params={"parcel_type_id": parcel_type.id, "all_sessions": True},
+    )
+
+    assert response.status_code == 200
+    assert response.text == ""
+
+    await Parcel.filter(parcel_type_id=parcel_type.id).delete()
+    await parcel_type.delete()
@@ -0,0 +1,52 @@
+import io
+import json
+
+from loguru import logger
+
+from app.log import BackgroundSink, SampledLogger
+
+
+def test_background_sink_writes_json():
+    stream = io.StringIO()
+    handler_id = logger.add(
+        BackgroundSink(stream), level="INFO", format=lambda record: "{message}"
+    )
+    try:
+        logger.info("Parcel {parcel_id} saved", parcel_id="abc")
+        logger.debug("Filtered out {}", object())
+    finally:
+        logger.remove(handler_id)
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert record["message"] == "Parcel abc saved"
+    assert record["level"] == "INFO"
+    assert record["parcel_id"] == "abc"
+
+
+def test_sampled_logger_samples_each_call_site():
+    stream = io.StringIO()
+    handler_id = logger.add(
+        BackgroundSink(stream), level="INFO", format=lambda record: "{message}"
+    )
+    sampled_logger = SampledLogger(every=10)
+    try:
+        for n in range(25):
+            sampled_logger.info("first {}", n)
+            sampled_logger.info("second {}", n)
+    finally:
+        logger.remove(handler_id)
+
+    messages = [json.loads(line)["message"] for line in stream.getvalue().splitlines()]
+    assert messages == [
+        "first 0",
+        "second 0",
+        "first 10",
+        "second 10",
+        "first 20",
+        "second 20",
+    ]
+    assert json.loads(stream.getvalue().splitlines()[0])["function"] == (
+        "test_sampled_logger_samples_each_call_site"
+    )
@@ -0,0 +1,44 @@
+import pytest
+from httpx import AsyncClient
+
+from app.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_histogram_exposition():
+    registry = Registry()
+    histogram = Histogram(
+        "latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0), registry=registry
+    )
+    histogram.labels("a").observe(0.05)
+    histogram.labels("a").observe(0.5)
+    histogram.labels("a").observe(5)
+    Counter("events", "Events", registry=registry).inc(3)
+    Gauge("size", "Size", function=lambda: 42, registry=registry)
+
+    text = registry.expose()
+
+    assert 'latency_seconds_bucket{route="a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="a",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{route="a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="a"} 3' in text
+    assert "events_total 3.0" in text
+    assert "size 42" in text
+
+    with pytest.raises(ValueError):
+        Counter("events", "Duplicate", registry=registry)
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_records_routes(client: AsyncClient):
+    await client.get("/healthcheck")
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="get_health",'
+        'status="200"}' in response.text
+    )
+    assert "parcel_cache_hit_ratio" in response.text
+    assert 'usd_rate_cache_lookups{result="hits"}' in response.text
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.models.tortoise import OutboxMessage, ParcelType
+from app.outbox import OUTBOX_BACKLOG, Outbox, outbox
+from app.registry import parcel_type_registry
+from app.wire import PARCELS_V1_CONTENT_TYPE, decode
+
+
+class FakePublisher:
+    """Publisher of a broker that can be taken down and brought back."""
+
+    content_type = PARCELS_V1_CONTENT_TYPE
+
+    def __init__(self):
+        self.down = True
+        self.is_started = False
+        self.published = []
+
+    async def start(self):
+        if self.down:
+            raise ConnectionError("broker unreachable")
+        self.is_started = True
+
+    async def publish_body(self, body, content_type):
+        await asyncio.sleep(0)
+        if self.down:
+            raise ConnectionError("broker unreachable")
+        self.published.append(decode(body, content_type))
+
+
+@pytest.mark.anyio
+async def test_outbox_accepts_parcels_during_broker_outage(client: AsyncClient, mocker):
+    mocker.patch.object(outbox, "enabled", True)
+    parcel_type = await ParcelType.create(name="outbox-type")
+    parcel_type_registry.invalidate()
+    parcel_data = {
+        "name": "Parcel",
+        "weight": 1.0,
+        "content_value_cents": 100,
+        "delivery_cost_cents": None,
+        "parcel_type_id": None,
+        "parcel_type": "outbox-type",
+    }
+    broker = FakePublisher()
+    relay = Outbox(batch_size=2, poll_interval=0.01, retry_interval=0.01)
+
+    ids = []
+    for _ in range(3):
+        response = await client.post("/parcels", json=parcel_data)
+        assert response.status_code == 202
+        ids.append(response.json()["id"])
+
+    with pytest.raises(ConnectionError):
+        await relay.relay_batch(broker)
+    await relay.update_stats()
+    assert await OutboxMessage.all().count() == 3
+    assert OUTBOX_BACKLOG.value == 3
+
+    relay.start(broker)
+    await asyncio.sleep(0.05)
+    assert broker.published == []
+    broker.down = False
+    for _ in range(100):
+        if await OutboxMessage.all().count() == 0:
+            break
+        await asyncio.sleep(0.01)
+    await relay.stop()
+
+    assert [parcel["id"] for (parcel,) in broker.published] == ids
+    await relay.update_stats()
+    assert OUTBOX_BACKLOG.value == 0
+    await parcel_type.delete()
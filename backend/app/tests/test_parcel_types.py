@@ -0,0 +1,63 @@
+import pytest
+from httpx import AsyncClient
+
+from app.models.tortoise import ParcelType
+from app.registry import parcel_type_registry
+
+
+@pytest.mark.anyio
+async def test_get_parcel_types_revalidates_with_etag(client: AsyncClient, mocker):
+    mocker.patch.object(parcel_type_registry.redis, "publish")
+
+    response = await client.post("/parcel_types", json={"name": "etag-type"})
+    assert response.status_code == 200
+    parcel_type_id = response.json()["id"]
+
+    response = await client.get("/parcel_types")
+    assert response.status_code == 200
+    assert {"id": parcel_type_id, "name": "etag-type"} in response.json()
+    etag = response.headers["ETag"]
+
+    response = await client.get("/parcel_types", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    await ParcelType.filter(id=parcel_type_id).delete()
+    await parcel_type_registry.publish_invalidation()
+    response = await client.get("/parcel_types", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_registry_serves_lookups_from_memory(client: AsyncClient, mocker):
+    parcel_type = await ParcelType.create(name="registry-type")
+    parcel_type_registry.invalidate()
+    assert await parcel_type_registry.get_id("registry-type") == parcel_type.id
+
+    load = mocker.spy(parcel_type_registry, "load")
+    for _ in range(10):
+        assert await parcel_type_registry.get_id("registry-type") == parcel_type.id
+    assert load.call_count == 0
+
+    await parcel_type.delete()
+    parcel_type_registry.invalidate()
+
+
+@pytest.mark.anyio
+async def test_registry_limits_reloads_on_unknown_types(client: AsyncClient, mocker):
+    mocker.patch.object(parcel_type_registry, "miss_reload_interval", 60)
+    await parcel_type_registry.get_id("no-such-type")
+
+    load = mocker.spy(parcel_type_registry, "load")
+    for n in range(10):
+        assert await parcel_type_registry.get_id(f"no-such-type-{n}") is None
+        assert await parcel_type_registry.get_name(10_000 + n) is None
+    assert load.call_count == 0
+
+    # An invalidation still reloads right away
+    parcel_type = await ParcelType.create(name="registry-new-type")
+    parcel_type_registry.invalidate()
+    assert await parcel_type_registry.get_id("registry-new-type") == parcel_type.id
+    assert load.call_count == 1
+
+    await parcel_type.delete()
+    parcel_type_registry.invalidate()
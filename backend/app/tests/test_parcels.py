@@ -2,13 +2,18 @@ from unittest.mock import Mock
 import pytest
 from httpx import AsyncClient
 
-from app.models.tortoise import ParcelType
+from app.main import session_manager
+from app.models.pydantic import ParcelOut
+from app.models.tortoise import Parcel, ParcelType
+from app.registry import parcel_type_registry
+from app.utils import calculate_delivery_cost, usd_rate_cache, usd_rate_source
 
 
 @pytest.mark.anyio
 async def test_create_parcel(client: AsyncClient, mocker):
     parcel_type = await ParcelType.create(name="clothes")
-    mocker.patch("app.api.parcel.send_to_queue", return_value=Mock())
+    parcel_type_registry.invalidate()
+    send = mocker.patch("app.api.parcel.send_to_queue", return_value=Mock())
     parcel_data = {
         "name": "Parcel for testing",
         "weight": 1.5,
@@ -28,7 +33,10 @@ async def test_create_parcel(client: AsyncClient, mocker):
     assert response.status_code == 202
 
     # Validate response
-    assert response.json() == {"message": "Parcel accepted and will be processed"}
+    result = response.json()
+    assert result["message"] == "Parcel accepted and will be processed"
+    (queued,) = send.call_args.args
+    assert queued["id"] == result["id"]
 
     await parcel_type.delete()
 
@@ -41,3 +49,145 @@ async def test_get_my_parcels(client: AsyncClient):
 
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+
+@pytest.mark.anyio
+async def test_quote_parcels(client: AsyncClient, mocker):
+    mocker.patch.object(usd_rate_source, "get_rate", return_value=90.0)
+    usd_rate_cache.invalidate()
+    parcel_data = {
+        "name": "Parcel for testing",
+        "weight": 1.5,
+        "content_value_cents": 10,
+        "delivery_cost_cents": None,
+        "parcel_type_id": None,
+        "parcel_type": "clothes",
+    }
+
+    response = await client.post("/parcels/quote", json=[parcel_data] * 3)
+
+    assert response.status_code == 200
+    quotes = response.json()
+    assert len(quotes) == 3
+    assert quotes[0]["content_value_cents"] == 1000
+    assert quotes[0]["delivery_cost_cents"] == calculate_delivery_cost(1.5, 1000, 90.0)
+    assert await Parcel.all().count() == 0
+
+
+@pytest.mark.anyio
+async def test_quote_refuses_oversized_list_before_validating(
+    client: AsyncClient, mocker
+):
+    mocker.patch("app.api.parcel.MAX_QUOTE_PARCELS", 2)
+    validate = mocker.patch("app.api.parcel.ParcelInList.validate_python")
+
+    response = await client.post("/parcels/quote", json=[{"name": "Parcel"}] * 3)
+
+    assert response.status_code == 413
+    validate.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_quote_rejects_invalid_parcel(client: AsyncClient):
+    response = await client.post("/parcels/quote", json=[{"name": "Parcel"}])
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][:2] == ["body", 0]
+
+
+@pytest.mark.anyio
+async def test_get_my_parcels_with_cursor(client: AsyncClient):
+    parcel_type = await ParcelType.create(name="cursor-type")
+    parcel_type_registry.invalidate()
+    cursor_session = session_manager.create_session_id()
+    for n in range(5):
+        await Parcel.create(
+            name=f"Parcel {n}",
+            weight=1,
+            content_value_cents=100,
+            parcel_type=parcel_type,
+            session_id=cursor_session,
+        )
+    client.cookies.set("session_id", cursor_session)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        response = await client.get("/parcels/my", params=params)
+        assert response.status_code == 200
+        seen += [parcel["id"] for parcel in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == sorted(
+        str(p.id) for p in await Parcel.filter(session_id=cursor_session)
+    )
+
+    response = await client.get("/parcels/my", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+    client.cookies.delete("session_id")
+    await Parcel.filter(session_id=cursor_session).delete()
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_get_my_parcels_matches_orm_serialization(client: AsyncClient):
+    parcel_type = await ParcelType.create(name="serialization-type")
+    parcel_type_registry.invalidate()
+    serialization_session = session_manager.create_session_id()
+    parcel = await Parcel.create(
+        name="Parcel",
+        weight=2.25,
+        content_value_cents=1000,
+        delivery_cost_cents=None,
+        parcel_type=parcel_type,
+        session_id=serialization_session,
+    )
+    await parcel.fetch_related("parcel_type")
+    client.cookies.set("session_id", serialization_session)
+
+    response = await client.get("/parcels/my")
+
+    assert response.status_code == 200
+    assert response.json() == [(await ParcelOut.from_orm(parcel)).model_dump()]
+
+    client.cookies.delete("session_id")
+    await parcel.delete()
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_create_parcels_batch(client: AsyncClient, mocker):
+    parcel_type = await ParcelType.create(name="batch-intake")
+    parcel_type_registry.invalidate()
+    send = mocker.patch("app.api.parcel.send_to_queue")
+    parcel_data = {
+        "name": "Parcel for testing",
+        "weight": 1.5,
+        "content_value_cents": 10,
+        "delivery_cost_cents": None,
+        "parcel_type_id": None,
+        "parcel_type": "batch-intake",
+    }
+
+    response = await client.post(
+        "/parcels/batch",
+        json=[parcel_data, {"name": "no weight"}, parcel_data | {"parcel_type": "?"}],
+    )
+
+    assert response.status_code == 202
+    result = response.json()
+    assert (result["accepted"], result["rejected"]) == (1, 2)
+    assert result["items"][0]["id"] is not None
+    assert "weight" in result["items"][1]["error"]
+    assert result["items"][2]["error"] == "Parcel type not found"
+
+    send.assert_called_once()
+    (envelope,) = send.call_args.args
+    assert [p["id"] for p in envelope["parcels"]] == [result["items"][0]["id"]]
+    assert envelope["parcels"][0]["parcel_type_id"] == parcel_type.id
+    assert envelope["parcels"][0]["content_value_cents"] == 1000
+
+    await parcel_type.delete()
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from aiormq.exceptions import ChannelPreconditionFailed
+
+from app.producer import Publisher, declare_parcel_queue
+from app.wire import JSON_CONTENT_TYPE
+
+
+class FakeExchange:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key, timeout=None):
+        await asyncio.sleep(0)
+        self.published.append((routing_key, message.body))
+
+
+class FakeQueue:
+    async def bind(self, exchange, routing_key):
+        pass
+
+
+class FakeChannel:
+    def __init__(self, exchange):
+        self.default_exchange = exchange
+        self.declared = []
+
+    async def declare_exchange(self, name, type, durable=False):
+        return name
+
+    async def declare_queue(self, name, durable=False, arguments=None):
+        self.declared.append(name)
+        return FakeQueue()
+
+    async def close(self):
+        pass
+
+
+class BrokerChannel(FakeChannel):
+    """Redeclares queues like RabbitMQ: with the same arguments or not at all."""
+
+    def __init__(self, queues):
+        super().__init__(FakeExchange())
+        self.queues = queues
+
+    async def declare_queue(self, name, durable=False, arguments=None):
+        if self.queues.setdefault(name, arguments or {}) != (arguments or {}):
+            raise ChannelPreconditionFailed(f"inequivalent arguments for {name}")
+        return await super().declare_queue(name, durable, arguments)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.exchange = FakeExchange()
+        self.channels = []
+        self.closed = False
+
+    async def channel(self, publisher_confirms=True):
+        channel = FakeChannel(self.exchange)
+        self.channels.append(channel)
+        return channel
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connection(mocker):
+    connection = FakeConnection()
+    mocker.patch("app.producer.aio_pika.connect_robust", return_value=connection)
+    return connection
+
+
+@pytest.mark.anyio
+async def test_publisher_reuses_connection(connection):
+    publisher = Publisher(
+        "amqp://test/", pool_size=2, max_in_flight=4, content_type=JSON_CONTENT_TYPE
+    )
+    await publisher.start()
+
+    await asyncio.gather(*(publisher.publish({"n": n}) for n in range(20)))
+    await publisher.close()
+
+    assert len(connection.exchange.published) == 20
+    assert len(connection.channels) <= 2
+    declared = [name for c in connection.channels for name in c.declared]
+    assert declared.count("parcel_queue") == 1
+    assert connection.closed
+
+
+@pytest.mark.anyio
+async def test_publisher_rejects_publish_when_not_started():
+    publisher = Publisher("amqp://test/")
+
+    with pytest.raises(RuntimeError):
+        await publisher.publish({"n": 1})
+
+
+@pytest.mark.anyio
+async def test_declare_keeps_existing_parcel_queue():
+    # Declared by an earlier release, without arguments
+    channel = BrokerChannel({"parcel_queue": {}})
+
+    await declare_parcel_queue(channel, (100, 1000))
+
+    assert channel.queues["parcel_queue"] == {}
+    assert {"parcel_queue.dead", "parcel_queue.retry.100"} <= set(channel.queues)
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+
+from app.rates import (
+    USD_RATE_FRESH_KEY,
+    USD_RATE_KEY,
+    USD_RATE_LOCK_KEY,
+    CbrRateProvider,
+    SharedUsdRate,
+)
+
+
+class FakeRedis:
+    def __init__(self, **values):
+        self.values = values
+
+    async def mget(self, *keys):
+        return [self.values.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode()
+        return True
+
+    async def eval(self, script, numkeys, key, token):
+        # RELEASE_LOCK_SCRIPT: delete the key only if it still holds the token
+        if self.values.get(key) != token.encode():
+            return 0
+        del self.values[key]
+        return 1
+
+
+@pytest.fixture
+async def cbr_stub():
+    """Local HTTP server answering like the CBR daily JSON feed."""
+    requests = []
+    body = json.dumps({"Valute": {"USD": {"Value": 91.5}}}).encode()
+
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        requests.append(1)
+        await asyncio.sleep(0.05)
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            b"Content-Length: %d\r\nConnection: close\r\n\r\n%s" % (len(body), body)
+        )
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/daily_json.js", requests
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.anyio
+async def test_cold_start_fetches_once(cbr_stub):
+    url, requests = cbr_stub
+    redis = FakeRedis()
+    shared = SharedUsdRate(redis, CbrRateProvider(url), poll_interval=0.01)
+
+    rates = await asyncio.gather(*(shared.get_rate() for _ in range(10)))
+
+    assert rates == [91.5] * 10
+    assert len(requests) == 1
+    assert redis.values[USD_RATE_KEY] == b"91.5"
+    assert USD_RATE_FRESH_KEY in redis.values
+    assert USD_RATE_LOCK_KEY not in redis.values
+
+
+@pytest.mark.anyio
+async def test_stale_rate_served_while_refreshing(cbr_stub):
+    url, requests = cbr_stub
+    redis = FakeRedis(**{USD_RATE_KEY: b"90.0"})
+    shared = SharedUsdRate(redis, CbrRateProvider(url))
+
+    rates = await asyncio.gather(*(shared.get_rate() for _ in range(10)))
+    assert rates == [90.0] * 10
+
+    await shared._refresh_task
+    assert len(requests) == 1
+    assert await shared.get_rate() == 91.5
+
+
+@pytest.mark.anyio
+async def test_refresh_skipped_when_locked_elsewhere(cbr_stub):
+    url, requests = cbr_stub
+    redis = FakeRedis(**{USD_RATE_KEY: b"90.0", USD_RATE_LOCK_KEY: b"1"})
+    shared = SharedUsdRate(redis, CbrRateProvider(url))
+
+    assert await shared.get_rate() == 90.0
+    assert await shared._refresh_task is None
+    assert requests == []
+
+
+@pytest.mark.anyio
+async def test_refresh_keeps_lock_taken_over_after_expiry():
+    redis = FakeRedis()
+
+    class SlowProvider:
+        async def fetch_usd_rate(self):
+            # The lock expires during the fetch and another process takes it
+            redis.values[USD_RATE_LOCK_KEY] = b"other-process"
+            return 91.0
+
+    assert await SharedUsdRate(redis, SlowProvider()).refresh() == 91.0
+    assert redis.values[USD_RATE_LOCK_KEY] == b"other-process"
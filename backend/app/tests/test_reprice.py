@@ -0,0 +1,117 @@
+import json
+import uuid
+
+import pytest
+
+from app.config import get_settings
+from app.models.tortoise import Parcel, ParcelType
+from app.reprice import Repricer, shard_range
+from app.stats import aggregate_parcels, rebuild_summary, session_stats
+from app.utils import calculate_delivery_cost
+
+
+def new_state(rate, only_missing=True, last_id=None):
+    return {
+        "rate": rate,
+        "only_missing": only_missing,
+        "shard": 0,
+        "shards": 1,
+        "last_id": last_id,
+        "scanned": 0,
+        "repriced": 0,
+        "done": False,
+    }
+
+
+async def create_parcels(session_id, costs):
+    parcel_type = await ParcelType.create(name=f"reprice-{session_id}")
+    parcels = [
+        await Parcel.create(
+            id=uuid.uuid4(),
+            name="Parcel",
+            weight=1.0 + n,
+            content_value_cents=1000,
+            delivery_cost_cents=cost,
+            parcel_type=parcel_type,
+            session_id=session_id,
+        )
+        for n, cost in enumerate(costs)
+    ]
+    return parcel_type, sorted(parcels, key=lambda parcel: str(parcel.id))
+
+
+@pytest.mark.anyio
+async def test_reprice_prices_missing_costs_in_chunks(client, mocker, tmp_path):
+    invalidate = mocker.patch("app.reprice.parcel_cache.invalidate")
+    parcel_type, parcels = await create_parcels(
+        "reprice-missing", [None, None, 123, None, None]
+    )
+    checkpoint = tmp_path / "reprice.json"
+
+    state = await Repricer(
+        new_state(90.0), chunk_size=2, concurrency=2, checkpoint_path=str(checkpoint)
+    ).run()
+
+    for parcel in parcels:
+        await parcel.refresh_from_db()
+        expected = (
+            123
+            if parcel.weight == 3.0
+            else calculate_delivery_cost(parcel.weight, 1000, 90.0)
+        )
+        assert parcel.delivery_cost_cents == expected
+    invalidated = {
+        parcel_id for call in invalidate.call_args_list for parcel_id in call.args[0]
+    }
+    assert {str(parcel.id) for parcel in parcels if parcel.weight != 3.0} <= invalidated
+    assert json.loads(checkpoint.read_text()) == state
+    assert state["done"] and state["repriced"] >= 4
+
+    await Parcel.filter(parcel_type_id=parcel_type.id).delete()
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_reprice_resumes_after_checkpoint(client, mocker):
+    mocker.patch("app.reprice.parcel_cache.invalidate")
+    parcel_type, parcels = await create_parcels("reprice-resume", [None] * 4)
+
+    await Repricer(new_state(90.0, last_id=str(parcels[1].id)), chunk_size=2).run()
+
+    costs = [(await Parcel.get(id=parcel.id)).delivery_cost_cents for parcel in parcels]
+    assert costs[:2] == [None, None]
+    assert None not in costs[2:]
+
+    await Parcel.filter(parcel_type_id=parcel_type.id).delete()
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_reprice_all_keeps_summary_in_step(client, mocker):
+    mocker.patch("app.reprice.parcel_cache.invalidate")
+    mocker.patch.object(get_settings(), "parcel_stats_summary", True)
+    parcel_type, parcels = await create_parcels("reprice-all", [100, None, 300])
+    await rebuild_summary()
+
+    await Repricer(new_state(95.5, only_missing=False), chunk_size=2).run()
+
+    for parcel in parcels:
+        await parcel.refresh_from_db()
+        assert parcel.delivery_cost_cents == calculate_delivery_cost(
+            parcel.weight, 1000, 95.5
+        )
+    expected = await aggregate_parcels(Parcel.filter(session_id="reprice-all"))
+    assert await session_stats("reprice-all") == expected
+    assert [row["count"] for row in expected] == [3]
+
+    await Parcel.filter(parcel_type_id=parcel_type.id).delete()
+    await parcel_type.delete()
+    await rebuild_summary()
+
+
+def test_shard_ranges_cover_the_key_space():
+    assert shard_range(0, 1) == (None, None)
+    ranges = [shard_range(shard, 4) for shard in range(4)]
+    assert ranges[0][0] is None and ranges[-1][1] is None
+    assert ranges[1][0] == "40000000-0000-0000-0000-000000000000"
+    assert all(ranges[n][1] == ranges[n + 1][0] for n in range(3))
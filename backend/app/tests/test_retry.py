@@ -0,0 +1,128 @@
+import pytest
+from httpx import AsyncClient
+
+from app.consumer import on_message
+from app.dead_letters import replay
+from app.models.tortoise import ParcelType
+from app.producer import ATTEMPTS_HEADER
+from app.registry import parcel_type_registry
+from app.retry import RetryPolicy
+from app.utils import usd_rate_cache, usd_rate_source
+from tests.stub_broker import StubChannel
+
+
+class FakeExchange:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key):
+        self.published.append((routing_key, message))
+
+
+class FakeChannel:
+    def __init__(self, dead_letters=()):
+        self.default_exchange = FakeExchange()
+        self.dead_letters = list(dead_letters)
+
+    async def get_queue(self, name):
+        return self
+
+    async def get(self, no_ack=False, fail=True):
+        return self.dead_letters.pop(0) if self.dead_letters else None
+
+
+def parcel_payload(parcel_type_id):
+    return {
+        "name": "Parcel",
+        "weight": 1.5,
+        "content_value_cents": 1000,
+        "delivery_cost_cents": None,
+        "parcel_type_id": parcel_type_id,
+        "parcel_type": "clothes",
+        "session_id": "retry-session",
+    }
+
+
+@pytest.fixture
+def policy(mocker):
+    policy = RetryPolicy(max_attempts=3, delays_ms=(100, 1000))
+    policy.bind(FakeChannel())
+    mocker.patch("app.consumer.retry_policy", policy)
+    return policy
+
+
+@pytest.mark.anyio
+async def test_transient_error_is_retried_with_backoff(
+    client: AsyncClient, mocker, policy
+):
+    mocker.patch.object(usd_rate_source, "get_rate", side_effect=RuntimeError("down"))
+    usd_rate_cache.invalidate()
+    parcel_type = await ParcelType.create(name="retry-type")
+    parcel_type_registry.invalidate()
+    channel = StubChannel()
+
+    message = channel.message(parcel_payload(parcel_type.id))
+    await on_message(message)
+
+    ((routing_key, retried),) = policy.exchange.published
+    assert routing_key == "parcel_queue.retry.100"
+    assert retried.headers[ATTEMPTS_HEADER] == 1
+    assert retried.body == message.body
+    assert channel.acked == {1}
+
+    again = channel.message(parcel_payload(parcel_type.id))
+    again.headers[ATTEMPTS_HEADER] = 1
+    await on_message(again)
+    assert policy.exchange.published[-1][0] == "parcel_queue.retry.1000"
+
+    last = channel.message(parcel_payload(parcel_type.id))
+    last.headers[ATTEMPTS_HEADER] = 2
+    await on_message(last)
+    assert len(policy.exchange.published) == 2
+    assert channel.rejected == {3}
+
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_permanent_errors_are_dead_lettered(client: AsyncClient, policy):
+    channel = StubChannel()
+
+    await on_message(channel.message(parcel_payload(parcel_type_id=987654)))
+    await on_message(channel.message({"name": "no weight"}))
+
+    assert policy.exchange.published == []
+    assert channel.rejected == {1, 2}
+
+
+@pytest.mark.anyio
+async def test_message_is_requeued_when_retry_fails(
+    client: AsyncClient, mocker, policy
+):
+    mocker.patch.object(
+        policy, "handle_failure", side_effect=ConnectionError("channel closed")
+    )
+    channel = StubChannel()
+    failed = channel.message({"name": "no weight"})
+    later = channel.message({"name": "no weight either"})
+
+    await on_message(failed)
+    await later.ack(multiple=True)
+
+    assert channel.requeued == {1}
+    assert channel.acked == {2}
+
+
+@pytest.mark.anyio
+async def test_replay_moves_dead_letters_back():
+    stub = StubChannel()
+    messages = [stub.message({"n": n}) for n in range(5)]
+    messages[0].headers[ATTEMPTS_HEADER] = 4
+    channel = FakeChannel(messages)
+
+    assert await replay(channel, batch_size=2) == 5
+
+    published = channel.default_exchange.published
+    assert [routing_key for routing_key, _ in published] == ["parcel_queue"] * 5
+    assert ATTEMPTS_HEADER not in published[0][1].headers
+    assert stub.acked == {1, 2, 3, 4, 5}
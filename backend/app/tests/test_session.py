@@ -0,0 +1,46 @@
+from unittest.mock import Mock
+
+import pytest
+from httpx import AsyncClient
+
+from app.main import create_app, session_manager
+from app.models.tortoise import ParcelType
+from app.registry import parcel_type_registry
+
+
+@pytest.mark.anyio
+async def test_session_id_is_assigned_and_verified_once(client: AsyncClient, mocker):
+    parcel_type = await ParcelType.create(name="session-type")
+    parcel_type_registry.invalidate()
+    send = mocker.patch("app.api.parcel.send_to_queue", return_value=Mock())
+    parcel_data = {
+        "name": "Parcel",
+        "weight": 1.0,
+        "content_value_cents": 100,
+        "delivery_cost_cents": None,
+        "parcel_type_id": None,
+        "parcel_type": "session-type",
+    }
+
+    # A separate client, so that the cookie jar starts empty
+    async with AsyncClient(app=create_app(), base_url="http://test") as c:
+        response = await c.get("/healthcheck")
+        assert "set-cookie" not in response.headers
+
+        response = await c.post("/parcels", json=parcel_data)
+        assert response.status_code == 202
+        session_id = response.cookies["session_id"]
+        (queued,) = send.call_args.args
+        assert queued["session_id"] == session_id
+
+        loads = mocker.spy(session_manager.serializer, "loads")
+        response = await c.post("/parcels", json=parcel_data)
+        assert "set-cookie" not in response.headers
+        assert send.call_args.args[0]["session_id"] == session_id
+        loads.assert_not_called()
+
+        c.cookies.set("session_id", "forged")
+        response = await c.post("/parcels", json=parcel_data)
+        assert response.cookies["session_id"] not in ("forged", session_id)
+
+    await parcel_type.delete()
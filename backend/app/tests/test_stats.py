@@ -0,0 +1,141 @@
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import get_settings
+from app.consumer import save_parcel_async, save_parcels_async
+from app.main import session_manager
+from app.models.tortoise import Parcel, ParcelStats, ParcelType
+from app.registry import parcel_type_registry
+from app.stats import aggregate_parcels, rebuild_summary, session_stats
+
+
+def parcel_payload(parcel_type_id, session_id, weight=1.5):
+    return {
+        "id": str(uuid.uuid4()),
+        "name": "Parcel",
+        "weight": weight,
+        "content_value_cents": 1000,
+        "parcel_type_id": parcel_type_id,
+        "session_id": session_id,
+    }
+
+
+@pytest.mark.anyio
+async def test_parcel_stats_groups_by_type_and_priced(client: AsyncClient):
+    session_id = session_manager.create_session_id()
+    clothes = await ParcelType.create(name="stats-clothes")
+    others = await ParcelType.create(name="stats-others")
+    for weight, parcel_type, cost in [
+        (1.0, clothes, 500),
+        (2.0, clothes, 700),
+        (3.0, clothes, None),
+        (4.0, others, 100),
+    ]:
+        await Parcel.create(
+            id=uuid.uuid4(),
+            name="Parcel",
+            weight=weight,
+            content_value_cents=1000,
+            delivery_cost_cents=cost,
+            parcel_type=parcel_type,
+            session_id=session_id,
+        )
+    await Parcel.create(
+        id=uuid.uuid4(),
+        name="Other session",
+        weight=9.0,
+        content_value_cents=1000,
+        delivery_cost_cents=1,
+        parcel_type=clothes,
+        session_id="other-session",
+    )
+    parcel_type_registry.invalidate()
+    client.cookies.set("session_id", session_id)
+
+    response = await client.get("/parcels/stats")
+
+    assert response.status_code == 200
+    stats = response.json()
+    assert (stats["count"], stats["total_weight"]) == (4, 10.0)
+    assert stats["total_delivery_cost_cents"] == 1300
+    assert [
+        (g["parcel_type"], g["priced"], g["count"], g["total_delivery_cost_cents"])
+        for g in stats["groups"]
+    ] == [
+        ("stats-clothes", True, 2, 1200),
+        ("stats-clothes", False, 1, 0),
+        ("stats-others", True, 1, 100),
+    ]
+
+    client.cookies.delete("session_id")
+    await Parcel.filter(parcel_type_id__in=[clothes.id, others.id]).delete()
+    await clothes.delete()
+    await others.delete()
+
+
+@pytest.mark.anyio
+async def test_parcel_stats_group_unresolved_types_as_unknown(
+    client: AsyncClient, mocker
+):
+    session_id = session_manager.create_session_id()
+    parcel_type = await ParcelType.create(name="stats-vanishing")
+    await Parcel.create(
+        id=uuid.uuid4(),
+        name="Parcel",
+        weight=1.0,
+        content_value_cents=1000,
+        delivery_cost_cents=500,
+        parcel_type=parcel_type,
+        session_id=session_id,
+    )
+    mocker.patch.object(parcel_type_registry, "get_name", return_value=None)
+    client.cookies.set("session_id", session_id)
+
+    response = await client.get("/parcels/stats")
+
+    assert response.status_code == 200
+    assert [g["parcel_type"] for g in response.json()["groups"]] == ["unknown"]
+
+    client.cookies.delete("session_id")
+    await Parcel.filter(parcel_type_id=parcel_type.id).delete()
+    await parcel_type.delete()
+
+
+@pytest.mark.anyio
+async def test_summary_table_matches_group_by(client: AsyncClient, mocker):
+    mocker.patch.object(get_settings(), "parcel_stats_summary", True)
+    parcel_type = await ParcelType.create(name="stats-summary")
+    await Parcel.create(
+        id=uuid.uuid4(),
+        name="Parcel",
+        weight=1.0,
+        content_value_cents=1000,
+        delivery_cost_cents=None,
+        parcel_type=parcel_type,
+        session_id="summary-session",
+    )
+    await rebuild_summary()
+
+    await save_parcel_async(parcel_payload(parcel_type.id, "summary-session"), 300)
+    await save_parcels_async(
+        [
+            (parcel_payload(parcel_type.id, "summary-session", weight=2.0), 200),
+            (parcel_payload(parcel_type.id, "summary-session", weight=3.0), 100),
+            (parcel_payload(parcel_type.id, None), 100),
+        ]
+    )
+
+    expected = await aggregate_parcels(Parcel.filter(session_id="summary-session"))
+    assert await session_stats("summary-session") == sorted(
+        expected, key=lambda row: not row["priced"]
+    )
+    priced = await ParcelStats.get(
+        session_id="summary-session", parcel_type_id=parcel_type.id, priced=True
+    )
+    assert (priced.count, priced.total_delivery_cost_cents) == (3, 600)
+    assert await ParcelStats.filter(session_id="").count() == 1
+
+    await Parcel.filter(parcel_type_id=parcel_type.id).delete()
+    await parcel_type.delete()
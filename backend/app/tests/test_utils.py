@@ -0,0 +1,62 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.utils import (
+    RateCache,
+    calculate_delivery_cost,
+    calculate_delivery_costs,
+    usd_rate_cache,
+)
+
+
+@pytest.mark.anyio
+async def test_rate_cache_refreshes_once_for_concurrent_callers(mocker):
+    source = mocker.Mock()
+    fetch = source.get_rate = mocker.AsyncMock(return_value=90.0)
+    cache = RateCache(source, ttl=60)
+
+    rates = await asyncio.gather(*(cache.get() for _ in range(50)))
+
+    assert rates == [90.0] * 50
+    assert fetch.call_count == 1
+    assert cache.misses == 1
+    assert cache.hits == 49
+    assert cache.version == 1
+
+
+@pytest.mark.anyio
+async def test_rate_cache_reloads_after_ttl(mocker):
+    source = mocker.Mock()
+    fetch = source.get_rate = mocker.AsyncMock(side_effect=[90.0, 91.0])
+    cache = RateCache(source, ttl=0)
+
+    assert await cache.get() == 90.0
+    assert await cache.get() == 91.0
+    assert fetch.call_count == 2
+    assert cache.version == 2
+
+
+def test_pricing_batch_hits_redis_once(mocker):
+    redis_get = mocker.patch("app.utils.REDIS_CLIENT.get", return_value=b"90.0")
+    usd_rate_cache.invalidate()
+
+    costs = [calculate_delivery_cost(1.5, 1000) for _ in range(10_000)]
+
+    assert set(costs) == {96750}
+    assert redis_get.call_count == 1
+
+
+def test_vectorized_costs_match_scalar_path():
+    rng = np.random.default_rng(42)
+    weights = rng.uniform(0, 100, 10_000).round(3)
+    values = rng.integers(0, 10_000_000, 10_000)
+
+    costs = calculate_delivery_costs(weights, values, 91.2345)
+
+    assert costs.dtype == np.int64
+    assert costs.tolist() == [
+        calculate_delivery_cost(w, v, 91.2345)
+        for w, v in zip(weights.tolist(), values.tolist())
+    ]
@@ -0,0 +1,73 @@
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+from app import wire
+from app.consumer import on_message
+from app.models.tortoise import Parcel, ParcelType
+from app.registry import parcel_type_registry
+from app.utils import usd_rate_cache, usd_rate_source
+from tests.stub_broker import StubChannel
+
+
+def intake_payload(**fields):
+    return {
+        "id": str(uuid.uuid4()),
+        "name": "Посылка",
+        "weight": 1.5,
+        "content_value_cents": 1000,
+        "delivery_cost_cents": None,
+        "parcel_type_id": 3,
+        "parcel_type": "clothes",
+        "session_id": "wire-session",
+    } | fields
+
+
+def test_v1_round_trip_keeps_stored_fields():
+    parcels = [intake_payload(), intake_payload(id=None, session_id=None)]
+
+    body = wire.encode(parcels, wire.PARCELS_V1_CONTENT_TYPE)
+    decoded = wire.decode(body, wire.PARCELS_V1_CONTENT_TYPE)
+
+    stored = ("id", "name", "weight", "content_value_cents", "parcel_type_id")
+    for original, parcel in zip(parcels, decoded):
+        assert {key: parcel[key] for key in stored} == {
+            key: original[key] for key in stored
+        }
+        assert parcel["session_id"] == original["session_id"]
+    assert len(body) < len(wire.encode(parcels, wire.JSON_CONTENT_TYPE))
+
+
+def test_decode_keeps_json_messages_readable():
+    parcel = intake_payload()
+
+    assert wire.decode(wire.encode([parcel], wire.JSON_CONTENT_TYPE)) == [parcel]
+    assert wire.decode(b'{"parcels": [{"n": 1}, {"n": 2}]}', None) == [
+        {"n": 1},
+        {"n": 2},
+    ]
+    with pytest.raises(ValueError):
+        wire.decode(b"PQ\x01", wire.PARCELS_V1_CONTENT_TYPE)
+    with pytest.raises(ValueError):
+        wire.decode(b"{}", "application/x-unknown")
+
+
+@pytest.mark.anyio
+async def test_consumer_saves_v1_message(client: AsyncClient, mocker):
+    mocker.patch.object(usd_rate_source, "get_rate", return_value=90.0)
+    usd_rate_cache.invalidate()
+    parcel_type = await ParcelType.create(name="wire-type")
+    parcel_type_registry.invalidate()
+    channel = StubChannel()
+    payload = intake_payload(parcel_type_id=parcel_type.id)
+
+    await on_message(channel.message(payload, wire.PARCELS_V1_CONTENT_TYPE))
+
+    assert channel.acked == {1}
+    parcel = await Parcel.get(id=payload["id"])
+    assert parcel.name == payload["name"]
+    assert parcel.delivery_cost_cents == 96750
+
+    await parcel.delete()
+    await parcel_type.delete()